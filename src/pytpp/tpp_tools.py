@@ -27,6 +27,8 @@ import gzip
 import subprocess
 from collections import defaultdict
 
+from pytransit import fasta_tools
+
 def cleanargs(rawargs):
     #TODO: Write docstring
     args = []
@@ -372,20 +374,8 @@ def select_cycles(infile,i,j,outfile):
   output.close()
 
 def read_genome(filename, replicon_index):
-  s = ""
-  cur_index = 0
-  first_iteration = True
-  for line in open(filename):
-    if line[0]=='>': 
-      if first_iteration:
-        continue # skip fasta header
-      else:
-        cur_index += 1
-    else:
-      if cur_index == replicon_index:
-        s += line.strip()
-    first_iteration = False
-  return s.upper()
+  # records are indexed once (and memoized), and only the requested replicon is read
+  return fasta_tools.get_sequence(filename, replicon_index).upper()
 
 
 def parse_sam_header(sam_filename):
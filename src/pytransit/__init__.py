@@ -1,5 +1,5 @@
 
-__all__ = ["transit_tools", "tnseq_tools", "norm_tools", "stat_tools"]
+__all__ = ["transit_tools", "tnseq_tools", "norm_tools", "stat_tools", "fasta_tools"]
 
 
 __version__ = "v3.1.0"
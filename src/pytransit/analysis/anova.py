@@ -196,8 +196,7 @@ class AnovaMethod(base.MultiConditionMethod):
 
         genes = tnseq_tools.read_genes(self.annotation_path)
 
-        TASiteindexMap = {TA: i for i, TA in enumerate(sites)}
-        RvSiteindexesMap = tnseq_tools.rv_siteindexes_map(genes, TASiteindexMap, nterm=self.NTerminus, cterm=self.CTerminus)
+        RvSiteindexesMap = tnseq_tools.rv_siteindexes_map(genes, sites, nterm=self.NTerminus, cterm=self.CTerminus)
         MeansByRv = self.means_by_rv(data, RvSiteindexesMap, genes, conditions)
 
         self.transit_message("Running Anova")
@@ -646,6 +646,9 @@ class GIMethod(base.QuadConditionMethod):
         self.transit_message("Getting Data")
         (data, position) = transit_tools.get_validated_data(wiglist, wxobj=self.wxobj)
 
+        # Integer read-counts (see TRANSIT_DTYPE) would be truncated by normalization and LOESS
+        data = norm_tools.get_float_data(data)
+
         # Normalize data if specified
         if self.normalization != "nonorm":
             self.transit_message("Normalizing using: %s" % self.normalization)
@@ -284,6 +284,9 @@ class HMMMethod(base.SingleConditionMethod):
         (data, position) = transit_tools.get_validated_data(self.ctrldata, wxobj=self.wxobj)
         (K,N) = data.shape
 
+        # Integer read-counts (see TRANSIT_DTYPE) would be truncated by normalization and LOESS
+        data = norm_tools.get_float_data(data)
+
         # Normalize data
         if self.normalization != "nonorm":
             self.transit_message("Normalizing using: %s" % self.normalization)
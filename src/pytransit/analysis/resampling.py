@@ -216,7 +216,7 @@ class ResamplingMethod(base.DualConditionMethod):
                 CTerminus=0.0,
                 ctrl_lib_str="",
                 exp_lib_str="",
-                wxobj=None, Z = False, diffStrains = False, annotation_path_exp = "", combinedWigParams = None):
+                wxobj=None, Z = False, diffStrains = False, annotation_path_exp = "", combinedWigParams = None, explicitNorm = True):
 
         base.DualConditionMethod.__init__(self, short_name, long_name, short_desc, long_desc, ctrldata, expdata, annotation_path, output_file, normalization=normalization, replicates=replicates, LOESS=LOESS, NTerminus=NTerminus, CTerminus=CTerminus, wxobj=wxobj)
 
@@ -231,6 +231,7 @@ class ResamplingMethod(base.DualConditionMethod):
         self.diffStrains = diffStrains
         self.annotation_path_exp = annotation_path_exp if diffStrains else annotation_path
         self.combinedWigParams = combinedWigParams
+        self.explicitNorm = explicitNorm
 
     @classmethod
     def fromGUI(self, wxobj):
@@ -362,6 +363,7 @@ class ResamplingMethod(base.DualConditionMethod):
             sys.exit(0)
 
         normalization = kwargs.get("n", "TTR")
+        explicitNorm = "n" in kwargs
         samples = int(kwargs.get("s", 10000))
         adaptive = kwargs.get("a", False)
         doHistogram = kwargs.get("h", False)
@@ -396,11 +398,14 @@ class ResamplingMethod(base.DualConditionMethod):
                 NTerminus,
                 CTerminus,
                 ctrl_lib_str,
-                exp_lib_str, Z = Z, diffStrains = diffStrains, annotation_path_exp = annotationPathExp, combinedWigParams = combinedWigParams)
+                exp_lib_str, Z = Z, diffStrains = diffStrains, annotation_path_exp = annotationPathExp, combinedWigParams = combinedWigParams, explicitNorm = explicitNorm)
 
     def preprocess_data(self, position, data):
         (K,N) = data.shape
 
+        # Integer read-counts (see TRANSIT_DTYPE) would be truncated by normalization and LOESS
+        data = norm_tools.get_float_data(data)
+
         if self.normalization != "nonorm":
             self.transit_message("Normalizing using: %s" % self.normalization)
             (data, factors) = norm_tools.normalize_data(data, self.normalization, self.ctrldata+self.expdata, self.annotation_path)
@@ -464,34 +469,61 @@ class ResamplingMethod(base.DualConditionMethod):
             self.transit_message("Multiple annotation files found")
             self.transit_message("Mapping ctrl data to {0}, exp data to {1}".format(self.annotation_path, self.annotation_path_exp))
 
-        if self.combinedWigParams:
-            (position, data, filenamesInCombWig) = tnseq_tools.read_combined_wig(self.combinedWigParams['combined_wig'])
-            conditionsByFile, _, _, _ = tnseq_tools.read_samples_metadata(self.combinedWigParams['samples_metadata'])
-            conditions = self.wigs_to_conditions(conditionsByFile, filenamesInCombWig)
-            data, conditions = self.filter_wigs_by_conditions(data, conditions, self.combinedWigParams['conditions'])
-            data_ctrl = numpy.array([d for i, d in enumerate(data) if conditions[i].lower() == self.combinedWigParams['conditions'][0]])
-            data_exp = numpy.array([d for i, d in enumerate(data) if conditions[i].lower() == self.combinedWigParams['conditions'][1]])
-            position_ctrl, position_exp = position, position
-        else:
-            (data_ctrl, position_ctrl) = transit_tools.get_validated_data(self.ctrldata, wxobj=self.wxobj)
-            (data_exp, position_exp) = transit_tools.get_validated_data(self.expdata, wxobj=self.wxobj)
-        (K_ctrl, N_ctrl) = data_ctrl.shape
-        (K_exp, N_exp) = data_exp.shape
-
-        if not self.diffStrains and (N_ctrl != N_exp):
-            self.transit_error("Error: Ctrl and Exp wig files don't have the same number of sites.")
-            self.transit_error("Make sure all .wig files come from the same strain.")
+        # Prebuilt Genes snapshots (see Genes.save) already hold the preprocessed data
+        snapshots = [len(wigs) == 1 and tnseq_tools.is_genes_snapshot(wigs[0]) for wigs in [self.ctrldata, self.expdata]]
+        if all(snapshots):
+            self.transit_message("Loading Genes snapshots")
+            G_ctrl = tnseq_tools.Genes(self.ctrldata, self.annotation_path, ignoreCodon=self.ignoreCodon, nterm=self.NTerminus, cterm=self.CTerminus)
+            G_exp = tnseq_tools.Genes(self.expdata, self.annotation_path_exp, ignoreCodon=self.ignoreCodon, nterm=self.NTerminus, cterm=self.CTerminus)
+            # Each snapshot was normalized on its own, so only per-dataset methods are comparable
+            if G_ctrl.norm != G_exp.norm:
+                self.transit_error("Error: Ctrl and Exp snapshots were normalized with different methods (%s, %s)." % (G_ctrl.norm, G_exp.norm))
+                return
+            if G_ctrl.norm not in norm_tools.dataset_methods:
+                self.transit_error("Error: Snapshots normalized with %s can not be compared; use one of: %s." % (G_ctrl.norm, ", ".join(norm_tools.dataset_methods)))
+                return
+            if self.explicitNorm and self.normalization != G_ctrl.norm:
+                self.transit_error("Error: Snapshots were normalized with %s, not %s." % (G_ctrl.norm, self.normalization))
+                return
+            if self.LOESS:
+                self.transit_error("Error: LOESS correction is not supported for Genes snapshots.")
+                return
+            self.normalization = G_ctrl.norm
+            self.transit_message("Snapshots normalized with: %s" % self.normalization)
+        elif any(snapshots):
+            self.transit_error("Error: Ctrl and Exp data must both be Genes snapshots, or both datasets.")
             return
-        # (data, position) = transit_tools.get_validated_data(self.ctrldata+self.expdata, wxobj=self.wxobj)
+        else:
+            if self.combinedWigParams:
+                conditionsByFile, _, _, _ = tnseq_tools.read_samples_metadata(self.combinedWigParams['samples_metadata'])
+                # Only parse the columns of the two conditions being compared
+                selectedFiles = [f for f, c in conditionsByFile.items() if c.lower() in self.combinedWigParams['conditions']]
+                (position, data, filenamesInCombWig) = tnseq_tools.read_combined_wig(self.combinedWigParams['combined_wig'], files=selectedFiles)
+                conditions = self.wigs_to_conditions(conditionsByFile, filenamesInCombWig)
+                data, conditions = self.filter_wigs_by_conditions(data, conditions, self.combinedWigParams['conditions'])
+                data_ctrl = numpy.array([d for i, d in enumerate(data) if conditions[i].lower() == self.combinedWigParams['conditions'][0]])
+                data_exp = numpy.array([d for i, d in enumerate(data) if conditions[i].lower() == self.combinedWigParams['conditions'][1]])
+                position_ctrl, position_exp = position, position
+            else:
+                (data_ctrl, position_ctrl) = transit_tools.get_validated_data(self.ctrldata, wxobj=self.wxobj)
+                (data_exp, position_exp) = transit_tools.get_validated_data(self.expdata, wxobj=self.wxobj)
+            (K_ctrl, N_ctrl) = data_ctrl.shape
+            (K_exp, N_exp) = data_exp.shape
+
+            if not self.diffStrains and (N_ctrl != N_exp):
+                self.transit_error("Error: Ctrl and Exp wig files don't have the same number of sites.")
+                self.transit_error("Make sure all .wig files come from the same strain.")
+                return
+            # (data, position) = transit_tools.get_validated_data(self.ctrldata+self.expdata, wxobj=self.wxobj)
 
-        self.transit_message("Preprocessing Ctrl data...")
-        data_ctrl = self.preprocess_data(position_ctrl, data_ctrl)
+            self.transit_message("Preprocessing Ctrl data...")
+            data_ctrl = self.preprocess_data(position_ctrl, data_ctrl)
 
-        self.transit_message("Preprocessing Exp data...")
-        data_exp = self.preprocess_data(position_exp, data_exp)
+            self.transit_message("Preprocessing Exp data...")
+            data_exp = self.preprocess_data(position_exp, data_exp)
 
-        G_ctrl = tnseq_tools.Genes(self.ctrldata, self.annotation_path, ignoreCodon=self.ignoreCodon, nterm=self.NTerminus, cterm=self.CTerminus, data=data_ctrl, position=position_ctrl)
-        G_exp = tnseq_tools.Genes(self.expdata, self.annotation_path_exp, ignoreCodon=self.ignoreCodon, nterm=self.NTerminus, cterm=self.CTerminus, data=data_exp, position=position_exp)
+            G_ctrl = tnseq_tools.Genes(self.ctrldata, self.annotation_path, ignoreCodon=self.ignoreCodon, nterm=self.NTerminus, cterm=self.CTerminus, data=data_ctrl, position=position_ctrl)
+            G_exp = tnseq_tools.Genes(self.expdata, self.annotation_path_exp, ignoreCodon=self.ignoreCodon, nterm=self.NTerminus, cterm=self.CTerminus, data=data_exp, position=position_exp)
 
         doLibraryResampling = False
         # If library string not empty
@@ -236,8 +236,8 @@ class Tn5GapsMethod(base.SingleConditionMethod):
 
         self.transit_message("Getting data (May take a while)")
 
-        # Combine all wigs
-        (data,position) = transit_tools.get_validated_data(self.ctrldata, wxobj=self.wxobj)
+        # Combine all wigs (zero-filled Tn5 data is kept sparse)
+        (data,position) = transit_tools.get_validated_data(self.ctrldata, wxobj=self.wxobj, sparse=True)
         combined = tnseq_tools.combine_replicates(data, method=self.replicates)
         combined[combined < self.minread] = 0
         counts = combined
@@ -265,7 +265,9 @@ class Tn5GapsMethod(base.SingleConditionMethod):
         # Get the runs
         self.transit_message("Getting non-insertion runs in genome")
         run_arr = tnseq_tools.runs_w_info(counts)
-        pos_hash = transit_tools.get_pos_hash(self.annotation_path)
+        run_starts = numpy.array([run['start'] for run in run_arr], dtype=int)
+        run_ends = numpy.array([run['end'] for run in run_arr], dtype=int)
+        run_lengths = numpy.array([run['length'] for run in run_arr], dtype=int)
 
         # Finally, calculate the results
         self.transit_message("Running Tn5 gaps method")
@@ -274,37 +276,41 @@ class Tn5GapsMethod(base.SingleConditionMethod):
             results_per_gene[gene.orf] = [gene.orf, gene.name, gene.desc, gene.k, gene.n, gene.r, 0, 0, 1]
 
         N = len(run_arr)
-        count = 0
-        accum = 0
-        self.progress_range(N)
-        for run in run_arr:
-            accum += run['length']
-            count += 1
-            genes = tnseq_tools.get_genes_in_range(pos_hash, run['start'], run['end'])
-            for gene_orf in genes:
-                start,end = gene.start,gene.end
-                a,b = self.NTerminus,self.CTerminus
-                if gene.strand=="-": a,b = b,a
-                start = start+int((end-start)*(a/100.))
-                end = end-int((end-start)*(b/100.))
-
-                gene = genes_obj[gene_orf]
-                inter_sz = self.intersect_size([run['start'], run['end']], [start,end]) + 1
-                percent_overlap = self.calc_overlap([run['start'], run['end']], [start,end])
-                run_len = run['length']
-                B = 1.0/math.log(1.0/pnon)
-                u = math.log(num_sites*pins, 1.0/pnon)
-                pval = 1.0 - tnseq_tools.GumbelCDF(run['length'], u, B)
-
-                curr_val = results_per_gene[gene.orf]
-                curr_inter_sz = curr_val[6]
-                curr_len = curr_val[7]
-                if inter_sz > curr_inter_sz:
-                    results_per_gene[gene.orf] = [gene.orf, gene.name, gene.desc, gene.k, gene.n, gene.r, inter_sz, run_len, pval]
+        accum = int(numpy.sum(run_lengths))
+
+        # Runs are matched to the genes, but overlaps are measured against the genes
+        # trimmed by the N/C-terminus percentages
+        gene_starts = numpy.array([gene.start for gene in genes_obj.genes], dtype=int)
+        gene_ends = numpy.array([gene.end for gene in genes_obj.genes], dtype=int)
+        minus = numpy.array([gene.strand == "-" for gene in genes_obj.genes], dtype=bool)
+        a = numpy.where(minus, self.CTerminus, self.NTerminus)
+        b = numpy.where(minus, self.NTerminus, self.CTerminus)
+        trim_starts = gene_starts + ((gene_ends-gene_starts)*(a/100.)).astype(int)
+        trim_ends = gene_ends - ((gene_ends-trim_starts)*(b/100.)).astype(int)
+        (run_index, gene_index, size) = tnseq_tools.get_run_gene_overlaps(run_starts, run_ends, gene_starts, gene_ends, trim_starts, trim_ends)
+        # Runs that only overlap the trimmed ends still count as an overlap of 1
+        inter_sz = numpy.maximum(size, 1)
+
+        # Keep the run with the largest overlap of each gene (the first one on ties)
+        order = numpy.lexsort((run_index, -inter_sz, gene_index))
+        best = order[numpy.concatenate([[True], gene_index[order][1:] != gene_index[order][:-1]])] if len(order) else order
+        # An N- or C-terminus trim of more than 100% leaves no coordinates to overlap
+        best = best[trim_ends[gene_index[best]] >= trim_starts[gene_index[best]]]
+
+        B = 1.0/math.log(1.0/pnon)
+        u = math.log(num_sites*pins, 1.0/pnon)
+        G = len(best)
+        self.progress_range(G)
+        for count,i in enumerate(best, 1):
+            gene = genes_obj.genes[gene_index[i]]
+            run_len = int(run_lengths[run_index[i]])
+            pval = 1.0 - tnseq_tools.GumbelCDF(run_len, u, B)
+            results_per_gene[gene.orf] = [gene.orf, gene.name, gene.desc, gene.k, gene.n, gene.r, int(inter_sz[i]), run_len, pval]
 
             # Update Progress
-            text = "Running Tn5Gaps method... %1.1f%%" % (100.0*count/N)
-            self.progress_update(text, count)
+            if count % max(1, G//100) == 0 or count == G:
+                text = "Running Tn5Gaps method... %1.1f%%" % (100.0*count/G)
+                self.progress_update(text, count)
 
         data = list(results_per_gene.values())
         exp_run_len = float(accum)/N
@@ -278,6 +278,9 @@ class UTestMethod(base.DualConditionMethod):
         (K,N) = data.shape
 
 
+        # Integer read-counts (see TRANSIT_DTYPE) would be truncated by normalization and LOESS
+        data = norm_tools.get_float_data(data)
+
         if self.normalization != "nonorm":
             self.transit_message("Normalizing using: %s" % self.normalization)
             (data, factors) = norm_tools.normalize_data(data, self.normalization, self.ctrldata+self.expdata, self.annotation_path)
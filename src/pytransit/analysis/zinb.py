@@ -567,8 +567,7 @@ class ZinbMethod(base.MultiConditionMethod):
 
         genes = tnseq_tools.read_genes(self.annotation_path)
 
-        TASiteindexMap = {TA: i for i, TA in enumerate(sites)}
-        RvSiteindexesMap = tnseq_tools.rv_siteindexes_map(genes, TASiteindexMap, nterm=self.NTerminus, cterm=self.CTerminus)
+        RvSiteindexesMap = tnseq_tools.rv_siteindexes_map(genes, sites, nterm=self.NTerminus, cterm=self.CTerminus)
         statsByRv, statGroupNames = self.stats_by_rv(data, RvSiteindexesMap, genes, conditions, interactions)
         LogZPercByRep, NZMeanByRep = self.global_stats_for_rep(data)
 
@@ -9,12 +9,16 @@ __all__ = [ basename(f)[:-3] for f in modules if isfile(f)]
 from pytransit.export import combined_wig
 from pytransit.export import igv
 from pytransit.export import mean_counts
+from pytransit.export import bundle
+from pytransit.export import genes
 
 # EXPORT METHODS
 methods = {}
 methods["combined_wig"] = combined_wig.CombinedWigExport()
 methods["igv"] = igv.IGVExport()
 methods["mean_counts"] = mean_counts.MeanCountsExport()
+methods["bundle"] = bundle.BundleExport()
+methods["genes"] = genes.GenesExport()
 
 
 
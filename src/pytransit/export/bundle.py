@@ -0,0 +1,159 @@
+import sys
+
+try:
+    import wx
+    WX_VERSION = int(wx.version()[0])
+    hasWx = True
+
+except Exception as e:
+    hasWx = False
+    WX_VERSION = 0
+
+if hasWx:
+    import wx.xrc
+    from wx.lib.buttons import GenBitmapTextButton
+    from pubsub import pub
+    import wx.adv
+
+
+import os
+import time
+import numpy
+
+from pytransit.export import base
+import pytransit
+import pytransit.transit_tools as transit_tools
+import pytransit.tnseq_tools as tnseq_tools
+
+
+############# Description ##################
+
+short_name = "bundle"
+long_name = "Method to export datasets as a binary TnSeq dataset bundle."
+description = "A method to pack datasets, their samples metadata and an index of the annotation into a single binary file, which TRANSIT methods can load directly."
+label = "to Dataset Bundle"
+transposons = ["himar1", "tn5"]
+
+############# Analysis Method ##############
+
+class BundleExport(base.TransitExport):
+    def __init__(self):
+        base.TransitExport.__init__(self, short_name, long_name, description, label, transposons, BundleMethod, BundleGUI,)
+
+
+################# GUI ##################
+
+class BundleGUI(base.ExportGUI):
+
+    def __init__(self):
+        base.ExportGUI.__init__(self)
+
+########## METHOD #######################
+
+class BundleMethod(base.SingleConditionMethod):
+    """
+    Bundle
+
+    """
+    def __init__(self,
+                ctrldata,
+                annotation_path,
+                output_file,
+                metadata_path="",
+                combined_wig=False,
+                wxobj=None):
+
+        base.SingleConditionMethod.__init__(self, short_name, long_name, description, label, ctrldata, annotation_path, output_file, normalization="nonorm", wxobj=wxobj)
+        self.metadata_path = metadata_path
+        self.combined_wig = combined_wig
+
+
+    @classmethod
+    def fromGUI(self, wxobj):
+        """ """
+
+        #Get Annotation file
+        annotationPath = wxobj.annotation
+        if not transit_tools.validate_annotation(annotationPath):
+            return None
+
+        #Get selected files
+        ctrldata = wxobj.ctrlSelected()
+        if not transit_tools.validate_control_datasets(ctrldata):
+            return None
+
+        #Get output path
+        defaultFileName = "datasets.tnbundle"
+        defaultDir = os.getcwd()
+        output_path = wxobj.SaveFile(defaultDir, defaultFileName)
+        if not output_path: return None
+        output_file = open(output_path, "wb")
+
+        return self(ctrldata,
+                annotationPath,
+                output_file,
+                wxobj=wxobj)
+
+    @classmethod
+    def fromargs(self, rawargs):
+        (args, kwargs) = transit_tools.cleanargs(rawargs)
+
+        if (len(args) != 3): # wigs prot_table output
+            print("Error: Incorrect number of args. See usage")
+            print(self.usage_string())
+            sys.exit(0)
+
+        ctrldata = args[0].split(",")
+        annotationPath = args[1]
+        outpath = args[2]
+        output_file = open(outpath, "wb")
+
+        metadata_path = kwargs.get("m", "")
+        combined_wig = kwargs.get("c", False)
+
+        return self(ctrldata,
+                annotationPath,
+                output_file,
+                metadata_path,
+                combined_wig)
+
+    def Run(self):
+
+        self.transit_message("Starting Dataset Bundle Export")
+        start_time = time.time()
+
+        self.transit_message("Getting Data")
+        if self.combined_wig:
+            (position, data, files) = tnseq_tools.read_combined_wig(self.ctrldata[0])
+            transposon = "himar1"
+        else:
+            (data, position) = transit_tools.get_validated_data(self.ctrldata, wxobj=self.wxobj)
+            files = self.ctrldata
+            types = tnseq_tools.get_file_types(self.ctrldata)
+            transposon = "tn5" if "himar1" not in types else "himar1"
+
+        self.transit_message("Writing %d datasets with %d sites" % data.shape)
+        tnseq_tools.write_dataset_bundle(self.output, data, position, files, self.annotation_path, self.metadata_path, transposon)
+
+        self.transit_message("") # Printing empty line to flush stdout
+        self.finish()
+        self.transit_message("Finished Export")
+
+#
+
+    @classmethod
+    def usage_string(self):
+        return """python %s export bundle <comma-separated .wig files> <annotation .prot_table or GFF3> <output file> [Optional Arguments]
+
+        Optional Arguments:
+        -m <samples_metadata file>  :=  Samples metadata to include in the bundle (e.g. for ANOVA/ZINB).
+        -c                          :=  The first argument is a combined wig file instead of .wig files.
+        """ % (sys.argv[0])
+
+
+if __name__ == "__main__":
+
+    (args, kwargs) = transit_tools.cleanargs(sys.argv[1:])
+
+    G = BundleMethod.fromargs(sys.argv[1:])
+    G.Run()
@@ -0,0 +1,167 @@
+import sys
+
+try:
+    import wx
+    WX_VERSION = int(wx.version()[0])
+    hasWx = True
+
+except Exception as e:
+    hasWx = False
+    WX_VERSION = 0
+
+if hasWx:
+    import wx.xrc
+    from wx.lib.buttons import GenBitmapTextButton
+    from pubsub import pub
+    import wx.adv
+
+
+import os
+import time
+import numpy
+
+from pytransit.export import base
+import pytransit
+import pytransit.transit_tools as transit_tools
+import pytransit.tnseq_tools as tnseq_tools
+
+
+############# Description ##################
+
+short_name = "genes"
+long_name = "Method to export datasets as a snapshot of their genes."
+description = "A method to save the normalized read-counts of datasets, assigned to the genes of an annotation, as a binary snapshot that TRANSIT methods (e.g. resampling) can load instead of the .wig files."
+label = "to Genes Snapshot"
+transposons = ["himar1", "tn5"]
+
+############# Analysis Method ##############
+
+class GenesExport(base.TransitExport):
+    def __init__(self):
+        base.TransitExport.__init__(self, short_name, long_name, description, label, transposons, GenesMethod, GenesGUI,)
+
+
+################# GUI ##################
+
+class GenesGUI(base.ExportGUI):
+
+    def __init__(self):
+        base.ExportGUI.__init__(self)
+
+########## METHOD #######################
+
+class GenesMethod(base.SingleConditionMethod):
+    """
+    Genes snapshot
+
+    """
+    def __init__(self,
+                ctrldata,
+                annotation_path,
+                output_file,
+                normalization="TTR",
+                minread=1,
+                ignoreCodon=True,
+                NTerminus=0.0,
+                CTerminus=0.0,
+                wxobj=None):
+
+        base.SingleConditionMethod.__init__(self, short_name, long_name, description, label, ctrldata, annotation_path, output_file, normalization=normalization, ignoreCodon=ignoreCodon, NTerminus=NTerminus, CTerminus=CTerminus, wxobj=wxobj)
+        self.minread = minread
+
+
+    @classmethod
+    def fromGUI(self, wxobj):
+        """ """
+
+        #Get Annotation file
+        annotationPath = wxobj.annotation
+        if not transit_tools.validate_annotation(annotationPath):
+            return None
+
+        #Get selected files
+        ctrldata = wxobj.ctrlSelected()
+        if not transit_tools.validate_control_datasets(ctrldata):
+            return None
+
+        #Get output path
+        defaultFileName = "datasets.genes"
+        defaultDir = os.getcwd()
+        output_path = wxobj.SaveFile(defaultDir, defaultFileName)
+        if not output_path: return None
+        output_file = open(output_path, "wb")
+
+        return self(ctrldata,
+                annotationPath,
+                output_file,
+                wxobj=wxobj)
+
+    @classmethod
+    def fromargs(self, rawargs):
+        (args, kwargs) = transit_tools.cleanargs(rawargs)
+
+        if (len(args) != 3): # wigs prot_table output
+            print("Error: Incorrect number of args. See usage")
+            print(self.usage_string())
+            sys.exit(0)
+
+        ctrldata = args[0].split(",")
+        annotationPath = args[1]
+        outpath = args[2]
+        output_file = open(outpath, "wb")
+
+        normalization = kwargs.get("n", "TTR")
+        minread = int(kwargs.get("m", 1))
+        ignoreCodon = not kwargs.get("sC", False)
+        NTerminus = float(kwargs.get("iN", 0.0))
+        CTerminus = float(kwargs.get("iC", 0.0))
+
+        return self(ctrldata,
+                annotationPath,
+                output_file,
+                normalization,
+                minread,
+                ignoreCodon,
+                NTerminus,
+                CTerminus)
+
+    def Run(self):
+
+        self.transit_message("Starting Genes Snapshot Export")
+        start_time = time.time()
+
+        self.transit_message("Getting Data")
+        (data, position) = transit_tools.get_validated_data(self.ctrldata, wxobj=self.wxobj)
+
+        self.transit_message("Normalizing using: %s" % self.normalization)
+        G = tnseq_tools.Genes(self.ctrldata, self.annotation_path, norm=self.normalization, minread=self.minread, ignoreCodon=self.ignoreCodon, nterm=self.NTerminus, cterm=self.CTerminus, data=data, position=position)
+
+        self.transit_message("Writing %d genes" % len(G))
+        G.save(self.output)
+
+        self.transit_message("") # Printing empty line to flush stdout
+        self.finish()
+        self.transit_message("Finished Export")
+
+#
+
+    @classmethod
+    def usage_string(self):
+        return """python %s export genes <comma-separated .wig files> <annotation .prot_table or GFF3> <output file> [Optional Arguments]
+
+        Optional Arguments:
+        -n <string>     :=  Normalization method. Default: -n TTR
+                            Resampling only accepts snapshots normalized with nonorm, TTR or zinfnb.
+        -m <integer>    :=  Smallest read-count to consider. Default: -m 1
+        -sC             :=  Include stop-codon (default is to ignore it).
+        -iN <float>     :=  Ignore TAs occuring within given percentage (as integer) of the N terminus. Default: -iN 0
+        -iC <float>     :=  Ignore TAs occuring within given percentage (as integer) of the C terminus. Default: -iC 0
+        """ % (sys.argv[0])
+
+
+if __name__ == "__main__":
+
+    (args, kwargs) = transit_tools.cleanargs(sys.argv[1:])
+
+    G = GenesMethod.fromargs(sys.argv[1:])
+    G.Run()
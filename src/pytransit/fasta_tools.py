@@ -0,0 +1,125 @@
+import os
+import mmap
+
+
+# Characters removed from sequence lines when extracting a record.
+WHITESPACE = b" \t\r\n"
+
+# Memoized record indexes, keyed by path (and invalidated by size/mtime).
+_index_cache = {}
+
+#
+
+def read_fasta_index(path):
+    """Returns the index of the records in a FASTA file.
+
+    The file is memory-mapped and only the header lines are scanned, so the
+    index can be built without reading the sequences. Indexes are memoized per
+    file and rebuilt if its size or modification time changes.
+
+    Arguments:
+        path (str): Path to the FASTA file.
+
+    Returns:
+        list: List of (name, start, end) tuples with the name of each record (first
+            word of the header) and the byte offsets of its sequence lines.
+
+    :Example:
+
+        >>> import pytransit.fasta_tools as fasta_tools
+        >>> print(fasta_tools.read_fasta_index("H37Rv.fna"))
+        [('NC_000962.3', 73, 4485098)]
+    """
+    st = os.stat(path)
+    key = os.path.abspath(path)
+    signature = (st.st_size, st.st_mtime_ns)
+    if key in _index_cache and _index_cache[key][0] == signature:
+        return _index_cache[key][1]
+
+    records = []
+    if st.st_size > 0:
+        with open(path, "rb") as f:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            try:
+                size = len(mm)
+                headers = [0] if mm[:1] == b">" else []
+                i = mm.find(b"\n>")
+                while i != -1:
+                    headers.append(i+1)
+                    i = mm.find(b"\n>", i+1)
+
+                # Sequence before the first header (if any) is kept as an unnamed record
+                if not headers or headers[0] > 0:
+                    records.append(("", 0, headers[0] if headers else size))
+
+                for k,h in enumerate(headers):
+                    line_end = mm.find(b"\n", h)
+                    if line_end == -1: line_end = size
+                    words = mm[h+1:line_end].decode("utf-8", "replace").split()
+                    name = words[0] if words else ""
+                    end = headers[k+1] if k+1 < len(headers) else size
+                    records.append((name, min(line_end+1, size), end))
+            finally:
+                mm.close()
+
+    _index_cache[key] = (signature, records)
+    return records
+
+#
+
+def get_record_names(path):
+    """Returns the names of the records in a FASTA file.
+
+    Arguments:
+        path (str): Path to the FASTA file.
+
+    Returns:
+        list: List with the name of each record, in order.
+    """
+    return [name for (name, start, end) in read_fasta_index(path)]
+
+#
+
+def get_sequence(path, replicon=0):
+    """Returns the sequence of a single record of a FASTA file.
+
+    Only the bytes of the requested record are read (through a memory map).
+
+    Arguments:
+        path (str): Path to the FASTA file.
+        replicon (int/str): Index or name of the record.
+
+    Returns:
+        str: String with the sequence of the record. Empty if there is no such record.
+    """
+    records = read_fasta_index(path)
+    if isinstance(replicon, str):
+        matches = [i for i,(name, start, end) in enumerate(records) if name == replicon]
+        if not matches: return ""
+        replicon = matches[0]
+    if replicon < 0 or replicon >= len(records):
+        return ""
+
+    (name, start, end) = records[replicon]
+    if end <= start:
+        return ""
+    with open(path, "rb") as f:
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            seq = mm[start:end].translate(None, WHITESPACE)
+        finally:
+            mm.close()
+    return seq.decode("ascii")
+
+#
+
+def read_sequence(path):
+    """Returns the sequences of all records of a FASTA file, concatenated.
+
+    Arguments:
+        path (str): Path to the FASTA file.
+
+    Returns:
+        str: String with the genomic sequence.
+    """
+    return "".join([get_sequence(path, i) for i in range(len(read_fasta_index(path)))])
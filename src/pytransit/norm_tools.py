@@ -1,7 +1,12 @@
 import sys
+import os
+import hashlib
+import multiprocessing
 import numpy
 import scipy.stats
 import scipy.optimize
+import scipy.special
+import scipy.sparse
 import warnings
 
 class NormMethod:
@@ -40,14 +45,14 @@ class NZMeanNorm(NormMethod):
 
         """
         (K,N) = data.shape
-        total_hits = numpy.sum(data,1)
-        TAs_hit = numpy.sum(data > 0, 1)
+        total_hits = numpy.asarray(data.sum(1)).ravel()
+        TAs_hit = numpy.asarray((data > 0).sum(1)).ravel()
         mean_hits = total_hits/TAs_hit
         grand_total = numpy.sum(mean_hits)
         grand_mean = grand_total/float(K)
         factors = numpy.zeros((K,1))
         factors[:,0] = grand_mean/mean_hits
-        data = factors * data
+        data = scale_data(data, factors)
         return (data, factors)
 
 
@@ -83,14 +88,14 @@ class TotReadsNorm(NormMethod):
 
         """
         (K,N) = data.shape
-        total_hits = numpy.sum(data,1)
+        total_hits = numpy.asarray(data.sum(1)).ravel()
         TAs = float(N)
         mean_hits = total_hits/TAs
         grand_total = numpy.sum(mean_hits)
         grand_mean = grand_total/float(K)
         factors = numpy.zeros((K,1))
         factors[:,0] = grand_mean/mean_hits
-        data = factors * data
+        data = scale_data(data, factors)
         return (data, factors)
 
 
@@ -184,13 +189,13 @@ class TTRNorm(NormMethod):
 
         .. seealso:: :class:`normalize_data`
         """
-        K = len(data)
-        N = len(data[0])
+        (K,N) = data.shape
 
         factors = numpy.zeros((K,1))
         for j in range(K):
-            factors[j] = float(target)/(thetaEst(data[j]) * muEst(data[j]))
-        data = factors * data
+            X = get_dense_row(data, j)
+            factors[j] = float(target)/(thetaEst(X) * muEst(X))
+        data = scale_data(data, factors)
         return (data, factors)
 
 
@@ -208,12 +213,13 @@ class EmpHistNorm(NormMethod):
         return negLL
 
     @staticmethod
-    def normalize(data, wigList=[], annotationPath=""):
+    def normalize(data, wigList=[], annotationPath="", workers=None):
         """Returns the normalized data, using the empirical hist method.
 
         Arguments:
             wigList (list): List of paths to wig formatted datasets.
             annotationPath (str): Path to annotation in .prot_table or GFF3 format.
+            workers (int): Number of worker processes used to fit the datasets (see map_datasets).
 
         Returns:
             numpy array: Array with the normalization factors for the emphist method.
@@ -236,7 +242,7 @@ class EmpHistNorm(NormMethod):
 
 
         G = tnseq_tools.Genes(wigList, annotationPath)
-        K = len(wigList)
+        K = G.data.shape[0]
         temp = []
         for j in range(K):
             reads_per_gene = []
@@ -249,19 +255,7 @@ class EmpHistNorm(NormMethod):
         temp = numpy.array(temp)
 
         factors = numpy.ones((K,1))
-        for j in range(1, K):
-            ii_good  = numpy.logical_and(temp[0,:] > 0,  temp[j,:] > 0)
-            logFC = numpy.log(temp[j,ii_good]/temp[0,ii_good])
-            mean = numpy.mean(logFC)
-            std = numpy.sqrt(numpy.var(logFC))
-            X = numpy.linspace(mean - (5*std),  mean + (std*5), 50000)
-            R = scipy.stats.gaussian_kde(logFC)
-            Y = R(X)
-            peakLogFC = X[Y.argmax()]
-            if peakLogFC < 0:
-                factors[j,0] = numpy.exp(abs(peakLogFC))
-            else:
-                factors[j,0] = 1.0/numpy.exp(abs(peakLogFC))
+        factors[1:,0] = map_datasets(_emphist_factor, [(temp[0], temp[j]) for j in range(1, K)], workers)
 
         data = factors * data
         return (data, factors)
@@ -282,7 +276,7 @@ class AdaptiveBGCNorm(NormMethod):
             return x
 
     @staticmethod
-    def normalize(data, wigList=[], annotationPath="", doTotReads = True, bgsamples = 200000):
+    def normalize(data, wigList=[], annotationPath="", doTotReads = True, bgsamples = 200000, workers=None):
         """Returns the normalized data using the aBGC method.
 
 
@@ -291,6 +285,7 @@ class AdaptiveBGCNorm(NormMethod):
                 for K datasets.
             doTotReads (bool):  Boolean specifying whether to do TTR normalization as well.
             bgsamples (int): Integeer specifying how many samples to take.
+            workers (int): Number of worker processes used to fit the datasets (see map_datasets).
 
         Returns:
             numpy array: Array with the normalized data.
@@ -312,49 +307,11 @@ class AdaptiveBGCNorm(NormMethod):
 
         K,N = data.shape
         norm_data = numpy.zeros(data.shape)
-        S = bgsamples
-        F = [i/100.0 for i in range(0,31) if i % 2 == 0]
-        BGC = []
-        param_list = []
         bgc_factors = []
-        for j in range(K):
-
-            nzdata = data[j][data[j] > 0]
-            nzdata.sort()
-            Nall = len(data[j])
-            Nnz = len(nzdata)
-            GOF_list = []
-            for frac in F:
-                tQ = numpy.arange(0,Nnz)/float(Nnz)
-                rho = 1.0/(scipy.stats.trim_mean(nzdata, frac))
-                rho_to_fit = rho
-
-                try:
-                    A = (numpy.sum(numpy.power(numpy.log(1.0-tQ),2)))/(numpy.sum(nzdata*numpy.log(1.0-tQ)))
-                    Kp = (2.0 * numpy.exp(A) - 1)   /(numpy.exp(A) + rho - 1)
-                    temp = scipy.stats.geom.rvs(scipy.stats.beta.rvs(Kp*rho, Kp*(1-rho), size=S), size=S)
-                    bgc_factors.append((rho, Kp))
-                except Except as e:
-                    print("aBGC Error:", str(e))
-                    print("%rho=s\tKp=%s\tA=%s" % (rho, Kp, A))
-                    temp = scipy.stats.geom.rvs(0.01, size=S)
-
-
-                corrected_nzdata = [cleaninfgeom(scipy.stats.geom.ppf(ecdf(temp, x), rho_to_fit), rho_to_fit) for x in nzdata]
-                corrected_nzmean = numpy.mean(corrected_nzdata)
-
-                Fp = scipy.stats.geom.ppf(numpy.arange(1,Nnz+1)/float(Nnz), 1.0/corrected_nzmean)
-                ii_inf = Fp == float("inf")
-                Fp[ii_inf] = max(Fp[~ii_inf]) + 100
-                ch2_indiv = numpy.power(corrected_nzdata- Fp, 2)/ Fp
-                GOF = max(ch2_indiv)
-                GOF_list.append((GOF, frac, rho_to_fit, Kp))
-
-            gof, frac, best_rho, best_Kp = sorted(GOF_list)[0]
-            BGsample = scipy.stats.geom.rvs(scipy.stats.beta.rvs(best_Kp*best_rho, best_Kp*(1-best_rho), size=S), size=S)
-            #BGC.append(dict([(x, removeinf(scipy.stats.geom.ppf(ecdf(temp, x), best_rho), best_rho)) for x in data[j]]))
-            for i in range(N):
-                norm_data[j,i] = cleaninfgeom(scipy.stats.geom.ppf(ecdf(BGsample, data[j,i]), best_rho), best_rho)
+        tasks = [(data[j], bgsamples, seed) for j,seed in enumerate(get_dataset_seeds(K))]
+        for j,(norm_reads, factors) in enumerate(map_datasets(_aBGC_dataset, tasks, workers)):
+            norm_data[j] = norm_reads
+            bgc_factors.extend(factors)
 
         if doTotReads:
             (norm_data, factors) = TTRNorm.normalize(norm_data)
@@ -366,7 +323,7 @@ class ZeroInflatedNBNorm(NormMethod):
     name = "zinfb"
 
     @staticmethod
-    def normalize(data, wigList=[], annotationPath=""):
+    def normalize(data, wigList=[], annotationPath="", workers=None):
         """Returns the normalization factors for the data using the zero-inflated
         negative binomial method.
 
@@ -374,6 +331,7 @@ class ZeroInflatedNBNorm(NormMethod):
         Arguments:
             data (numpy array): (K,N) numpy array defining read-counts at N sites
                 for K datasets.
+            workers (int): Number of worker processes used to fit the datasets (see map_datasets).
 
         Returns:
             numpy array: Array with the normalization factors for the zinfnb method.
@@ -392,18 +350,7 @@ class ZeroInflatedNBNorm(NormMethod):
 
         .. seealso:: :class:`normalize_data`
         """
-        N = len(data)
-        G = len(data[0])
-
-        factors = numpy.zeros((N, 1))
-        for j in range(N):
-            initParams = [0.3, 10, 0.5]
-            M = "L-BFGS-B"
-            Fdata = numpy.array(data[j])
-            results = scipy.optimize.minimize(Fzinfnb, initParams, args=(Fdata,), method=M, bounds=[(0.0001, 0.9999),(0.0001, None),(0.0001, 0.9999)])
-            pi, n, p = results.x
-            mu = n*(1-p)/p
-            factors[j,0] = 1.0/mu
+        factors = zinfnb_factors(data, workers)
         data = factors * data
         return (data, factors)
 
@@ -435,22 +382,20 @@ class QuantileNorm(NormMethod):
         .. seealso:: :class:`normalize_data`
 
         """
-        N = len(data)
-        G = len(data[0])
+        data = numpy.asarray(data)
         #Sort columns
-        s_data = numpy.array([sorted(col) for col in data])
-        #Get ranks of original data
+        order = numpy.argsort(data, axis=1, kind="stable")
+        s_data = numpy.take_along_axis(data, order, axis=1)
+        #Get (dense) ranks of original data, in sorted order, starting at 0
         ranks = numpy.zeros(data.shape, dtype=int)
-        for j in range(N):
-            ranks[j,:] = scipy.stats.rankdata(data[j], method='dense')
+        numpy.cumsum(s_data[:,1:] != s_data[:,:-1], axis=1, out=ranks[:,1:])
         #Get empirical distribution
         ranked_means = numpy.mean(s_data,0)
-        #Create dictionary of rank to new empirical values
-        rank2count = dict([(r,c) for (r,c) in zip(scipy.stats.rankdata(ranked_means, method='dense'), ranked_means)])
+        #Distinct values of the distribution, indexed by dense rank
+        rank2count = numpy.unique(ranked_means)
         #Assign values
         norm_data = numpy.zeros(data.shape)
-        for i in range(G):
-            norm_data[:,i] = [rank2count[ranks[j,i]] for j in range(N)]
+        numpy.put_along_axis(norm_data, order, rank2count[ranks], axis=1)
         return (norm_data, numpy.ones(1))
 
 
@@ -472,7 +417,7 @@ class BetaGeomNorm(NormMethod):
             return x
 
     @staticmethod
-    def normalize(data, wigList=[], annotationPath="", doTTR = True, bgsamples=200000):
+    def normalize(data, wigList=[], annotationPath="", doTTR = True, bgsamples=200000, workers=None):
         """Returns normalized data according to the BGC method.
 
         Arguments:
@@ -480,6 +425,7 @@ class BetaGeomNorm(NormMethod):
                 for K datasets.
             doTTR (bool): Boolean specifying whether to do TTR norm as well.
             bgsamples (int): Integer specifying how many samples to take.
+            workers (int): Number of worker processes used to fit the datasets (see map_datasets).
 
         Returns:
             numpy array: Array with the data normalized using the betageom method.
@@ -507,26 +453,10 @@ class BetaGeomNorm(NormMethod):
         grand_mean = grand_total/float(K)
         norm_data = numpy.zeros(data.shape)
         bgc_factors = []
-        for j in range(K):
-
-            tQ = numpy.arange(0,N)/float(N)
-            eX = numpy.array([rd for rd in data[j]])
-            eX.sort()
-
-            rho = max(1.0/scipy.stats.trim_mean(eX+1, 0.001), 0.0001)
-            A = (numpy.sum(numpy.power(numpy.log(1.0-tQ),2)))/(numpy.sum(eX*numpy.log(1.0-tQ)))
-            Kp = max((2.0 * numpy.exp(A) - 1)   /(numpy.exp(A) + rho - 1), 10)
-
-            bgc_factors.append((rho,Kp))
-            try:
-                BGsample = scipy.stats.geom.rvs(scipy.stats.beta.rvs(Kp*rho, Kp*(1-rho), size=bgsamples), size=bgsamples)
-            except Exception as e:
-                print("BGC ERROR with rho=%f, Kp=%f, A=%s" % (rho, Kp, A))
-                print(str(e))
-                BGsample = scipy.stats.geom.rvs(rho, size=bgsamples)
-
-            for i in range(N):
-                norm_data[j,i] = cleaninfgeom(scipy.stats.geom.ppf(ecdf(BGsample, data[j,i]), 1.0/grand_mean), 1.0/grand_mean)
+        tasks = [(data[j], grand_mean, bgsamples, seed) for j,seed in enumerate(get_dataset_seeds(K))]
+        for j,(norm_reads, factors) in enumerate(map_datasets(_betageom_dataset, tasks, workers)):
+            norm_data[j] = norm_reads
+            bgc_factors.append(factors)
 
         if doTTR:
             (norm_data, factors) = TTRNorm.normalize(norm_data)
@@ -551,9 +481,41 @@ methods["quantile"] = QuantileNorm
 methods["aBGC"] = AdaptiveBGCNorm
 methods["emphist"] = EmpHistNorm
 
+# Methods that only rescale each dataset, and so can work on sparse data directly.
+sparse_methods = ["nonorm", "TTR", "nzmean", "totreads"]
+
+# Type of the normalized data (e.g. "float32"). Empty keeps the type returned by the method.
+norm_dtype = os.environ.get("TRANSIT_NORM_DTYPE", "")
+
+# Methods whose normalized data is the read-counts scaled by their factors. Known
+# factors of these methods are reused instead of estimated again (see get_cached_factors).
+factor_methods = ["TTR", "nzmean", "totreads", "zinfnb", "emphist"]
+
+# Methods that estimate their factors from the wig files and annotation, not only from the data.
+file_methods = ["emphist"]
+
+# Directory where normalization factors are kept across runs. Defaults to the
+# data cache (TRANSIT_CACHE_DIR); empty keeps the factors in memory only.
+factor_cache_dir = os.environ.get("TRANSIT_NORM_CACHE_DIR", os.environ.get("TRANSIT_CACHE_DIR", ""))
+
+# Memoized normalization factors, keyed by get_factors_key.
+_factor_cache = {}
+
+# Methods whose factor for a dataset does not depend on the other datasets, so datasets
+# normalized separately (e.g. Genes snapshots of each condition) remain comparable.
+dataset_methods = ["nonorm", "TTR", "zinfnb"]
+
+# Methods that fit each dataset independently, and so can use worker processes.
+parallel_methods = ["zinfnb", "emphist", "betageom", "aBGC"]
+
+# Number of worker processes used by the parallel_methods. Defaults to TRANSIT_WORKERS;
+# 0 means one per core, and 1 fits the datasets serially. The value is parsed when it is
+# used (see map_datasets).
+norm_workers = os.environ.get("TRANSIT_NORM_WORKERS", os.environ.get("TRANSIT_WORKERS", "1"))
+
 
 #########################
-def normalize_data(data, method="nonorm", wigList=[], annotationPath=""):
+def normalize_data(data, method="nonorm", wigList=[], annotationPath="", dtype=None, cache=True, workers=None):
     """Normalizes the numpy array by the given normalization method.
 
     Arguments:
@@ -562,6 +524,13 @@ def normalize_data(data, method="nonorm", wigList=[], annotationPath=""):
         method (str): Name of the desired normalization method.
         wigList (list): List of paths for the desired wig-formatted datasets.
         annotationPath (str): Path to the prot_table annotation file.
+        dtype (str/type): Type of the normalized data. Defaults to norm_dtype
+            (TRANSIT_NORM_DTYPE environment variable); if empty, the type returned
+            by the method (float64 for most methods) is kept.
+        cache (bool): Whether to reuse the factors computed before for the same data
+            and method (see get_cached_factors).
+        workers (int): Number of worker processes used by the parallel_methods.
+            Defaults to norm_workers (TRANSIT_NORM_WORKERS environment variable).
 
     Returns:
         numpy array: Array with the normalized data.
@@ -583,16 +552,190 @@ def normalize_data(data, method="nonorm", wigList=[], annotationPath=""):
                [ 0.,  0.,  0., ...,  0.,  0.,  0.]])
 
     .. note:: Some normalization methods require the wigList and annotationPath arguments.
+    .. note:: Data may be a scipy.sparse matrix. Methods that do not simply rescale
+        the datasets (see sparse_methods) will convert it to a dense array.
+    .. note:: Normalizing in float32 keeps the normalized read-counts within a relative
+        error of about 1e-6 of the float64 values.
+    .. note:: Factors of the methods in factor_methods are cached by the content of the
+        data, so normalizing the same data again only rescales it.
 
     """
     factors = []
-    if method in methods:
-        return methods[method].normalize(data, wigList, annotationPath)
-    else:
+    data = get_float_data(data)
+    if scipy.sparse.issparse(data) and method not in sparse_methods:
+        data = data.toarray()
+    if method not in methods:
         warnstr = "Normalization method '%s' is unknown. Read-counts were not normalized." % (method)
         warnings.warn(warnstr)
-    return methods["nonorm"].normalize(data, wigList, annotationPath)
+        method = "nonorm"
+
+    key = None
+    if cache and method in factor_methods:
+        key = get_factors_key(data, method, wigList, annotationPath)
+        factors = get_cached_factors(key)
+    if key is not None and factors is not None:
+        data = scale_data(data, factors)
+    else:
+        kwargs = {"workers": workers} if method in parallel_methods else {}
+        (data, factors) = methods[method].normalize(data, wigList, annotationPath, **kwargs)
+        if key is not None:
+            set_cached_factors(key, factors)
+
+    if dtype is None:
+        dtype = norm_dtype
+    if dtype:
+        data = data.astype(dtype, copy=False)
+    return (data, factors)
+
+#
+
+def get_float_data(data):
+    """Returns the read-counts in a floating point type, so they can be normalized
+    or corrected (e.g. by LOESS) in place without being truncated.
+
+    Arguments:
+        data (numpy array): (K,N) numpy array (or scipy.sparse matrix) of read-counts.
+
+    Returns:
+        numpy array: The same data if its type is already floating point. Otherwise
+            (e.g. int32 data loaded with TRANSIT_DTYPE), a copy in norm_dtype, or
+            float64 if norm_dtype is empty.
+    """
+    if numpy.issubdtype(data.dtype, numpy.integer):
+        return data.astype(norm_dtype or numpy.float64)
+    return data
+
+
+def get_factors_key(data, method, wigList=[], annotationPath=""):
+    """Returns the key identifying the normalization factors of the data.
+
+    Arguments:
+        data (numpy array): (K,N) numpy array (or scipy.sparse matrix) defining
+            read-counts at N sites for K datasets.
+        method (str): Name of the normalization method.
+        wigList (list): List of paths to the wig files (only used by file_methods).
+        annotationPath (str): Path to the annotation (only used by file_methods).
+
+    Returns:
+        str: Hex digest of the method and the content of the data.
+    """
+    digest = hashlib.sha1()
+    digest.update(("%s:%s:%s" % (method, data.shape, data.dtype)).encode("utf-8"))
+    if scipy.sparse.issparse(data):
+        data = scipy.sparse.csc_matrix(data)
+        arrays = [data.indptr, data.indices, data.data]
+    else:
+        arrays = [data]
+    for array in arrays:
+        digest.update(numpy.ascontiguousarray(array).data)
+    if method in file_methods:
+        for path in list(wigList) + [annotationPath]:
+            st = os.stat(path)
+            digest.update(("%s:%d:%d" % (os.path.abspath(path), st.st_size, st.st_mtime_ns)).encode("utf-8"))
+    return digest.hexdigest()
+
+#
+
+def get_cached_factors(key, cache_dir=None):
+    """Returns the normalization factors stored with the given key.
+
+    Factors are looked up in memory first, and then in the cache directory.
+
+    Arguments:
+        key (str): Key of the factors (see get_factors_key).
+        cache_dir (str): Directory holding the cached factors. Defaults to
+            factor_cache_dir (TRANSIT_NORM_CACHE_DIR or TRANSIT_CACHE_DIR
+            environment variables).
+
+    Returns:
+        numpy array: Array with the factors, or None if they are not cached.
+    """
+    if key in _factor_cache:
+        return _factor_cache[key].copy()
+    if cache_dir is None:
+        cache_dir = factor_cache_dir
+    path = os.path.join(cache_dir, "norm_%s.npy" % key)
+    if not cache_dir or not os.path.exists(path):
+        return None
+    try:
+        factors = numpy.load(path)
+    except Exception as e:
+        warnings.warn("Could not read cached factors '%s': %s." % (path, e))
+        return None
+    _factor_cache[key] = factors
+    return factors.copy()
+
+#
+
+def set_cached_factors(key, factors, cache_dir=None):
+    """Stores the normalization factors with the given key.
+
+    Arguments:
+        key (str): Key of the factors (see get_factors_key).
+        factors (numpy array): (K,1) numpy array with the factor of each dataset.
+        cache_dir (str): Directory holding the cached factors. Defaults to factor_cache_dir.
+    """
+    factors = numpy.array(factors, dtype=float)
+    _factor_cache[key] = factors
+    if cache_dir is None:
+        cache_dir = factor_cache_dir
+    if not cache_dir:
+        return
+    path = os.path.join(cache_dir, "norm_%s.npy" % key)
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        temp_path = path + ".%d.tmp" % os.getpid()
+        with open(temp_path, "wb") as f:
+            numpy.save(f, factors)
+        os.replace(temp_path, path)
+    except OSError as e:
+        warnings.warn("Could not write cached factors '%s': %s." % (path, e))
+
+#
 
+def get_dataset_seeds(K):
+    """Returns a seed for the random samples of each of K datasets.
+
+    Seeds are drawn from numpy's global random state, so results only depend on
+    numpy.random.seed and not on how the datasets are split among processes.
+
+    Arguments:
+        K (int): Number of datasets.
+
+    Returns:
+        numpy array: (K) numpy array of seeds.
+    """
+    return numpy.random.randint(0, 2**31 - 1, size=K)
+
+#
+
+def map_datasets(function, tasks, workers=None):
+    """Applies the function to the task of each dataset, using a pool of worker processes.
+
+    Arguments:
+        function (function): Module-level function fitting a single dataset.
+        tasks (list): List with the argument of the function for each dataset.
+        workers (int): Number of worker processes. None means norm_workers; 0 or less
+            means one per available core, and 1 applies the function serially.
+
+    Returns:
+        list: List with the result for each dataset, in the order of tasks.
+    """
+    if workers is None:
+        try:
+            workers = int(norm_workers or 1)
+        except ValueError:
+            warnings.warn("Invalid number of workers in TRANSIT_NORM_WORKERS: '%s'. Fitting datasets serially." % norm_workers)
+            workers = 1
+    if workers <= 0:
+        workers = multiprocessing.cpu_count()
+    workers = max(1, min(workers, len(tasks)))
+    if workers == 1:
+        return [function(task) for task in tasks]
+    with multiprocessing.Pool(workers) as pool:
+        return pool.map(function, tasks)
+
+#
 
 def empirical_theta(X):
     """Calculates the observed density of the data.
@@ -662,7 +805,52 @@ def Fzinfnb(params, args):
     return negLL
 
 
-def zinfnb_factors(data):
+def Fzinfnb_hist(params, values, weights):
+    """Objective function for the zero-inflated NB method (see Fzinfnb), and its
+    gradient, computed from the histogram of the read-counts.
+
+    Arguments:
+        params (list): Parameters (pi, n, p) of the model.
+        values (numpy array): Distinct read-counts.
+        weights (numpy array): Number of sites with each read-count.
+
+    Returns:
+        tuple: Negative log-likelihood, and numpy array with its gradient.
+    """
+    pi, n, p = params
+    zero = values == 0
+    w0 = numpy.sum(weights[zero])
+    X = values[~zero]
+    W = weights[~zero]
+    Wnz = numpy.sum(W)
+
+    # Sites without reads: log(pi + NB(0; n, p)), with NB(0; n, p) = p^n
+    P0 = numpy.power(p, n)
+    LL = w0*numpy.log(pi + P0) if w0 else 0.0
+    grad = numpy.zeros(3)
+    if w0:
+        grad += w0/(pi + P0) * numpy.array([1.0, P0*numpy.log(p), P0*n/p])
+
+    # Sites with reads: log(1-pi) + log NB(x; n, p)
+    LL += Wnz*numpy.log(1.0-pi) + numpy.sum(W*(scipy.special.gammaln(X+n) - scipy.special.gammaln(X+1) + X*numpy.log(1.0-p))) + Wnz*(n*numpy.log(p) - scipy.special.gammaln(n))
+    grad[0] -= Wnz/(1.0-pi)
+    grad[1] += numpy.sum(W*scipy.special.digamma(X+n)) + Wnz*(numpy.log(p) - scipy.special.digamma(n))
+    grad[2] += Wnz*n/p - numpy.sum(W*X)/(1.0-p)
+    return (-LL, -grad)
+
+
+def _zinfnb_factor(reads):
+    """Returns the zinfnb normalization factor of a single dataset."""
+    initParams = [0.3, 10, 0.5]
+    M = "L-BFGS-B"
+    (values, weights) = numpy.unique(numpy.asarray(reads), return_counts=True)
+    results = scipy.optimize.minimize(Fzinfnb_hist, initParams, args=(values, weights.astype(float)), jac=True, method=M, bounds=[(0.0001, 0.9999),(0.0001, None),(0.0001, 0.9999)])
+    pi, n, p = results.x
+    mu = n*(1-p)/p
+    return 1.0/mu
+
+
+def zinfnb_factors(data, workers=None):
     """Returns the normalization factors for the data using the zero-inflated
     negative binomial method.
 
@@ -670,6 +858,7 @@ def zinfnb_factors(data):
     Arguments:
         data (numpy array): (K,N) numpy array defining read-counts at N sites
             for K datasets.
+        workers (int): Number of worker processes used to fit the datasets (see map_datasets).
 
     Returns:
         numpy array: Array with the normalization factors for the zinfnb method.
@@ -689,18 +878,96 @@ def zinfnb_factors(data):
     .. seealso:: :class:`normalize_data`
     """
     N = len(data)
-    G = len(data[0])
-
     factors = numpy.zeros((N, 1))
-    for j in range(N):
-        initParams = [0.3, 10, 0.5]
-        M = "L-BFGS-B"
-        Fdata = numpy.array(data[j])
-        results = scipy.optimize.minimize(Fzinfnb, initParams, args=(Fdata,), method=M, bounds=[(0.0001, 0.9999),(0.0001, None),(0.0001, 0.9999)])
-        pi, n, p = results.x
-        mu = n*(1-p)/p
-        factors[j,0] = 1.0/mu
-    return numpy.array(factors)
+    factors[:,0] = map_datasets(_zinfnb_factor, [data[j] for j in range(N)], workers)
+    return factors
+
+#
+
+def _emphist_factor(task):
+    """Returns the emphist normalization factor of a dataset, from the read-counts
+    of each gene in the dataset and in the reference (first) dataset."""
+    (reference, counts) = task
+    ii_good  = numpy.logical_and(reference > 0,  counts > 0)
+    logFC = numpy.log(counts[ii_good]/reference[ii_good])
+    mean = numpy.mean(logFC)
+    std = numpy.sqrt(numpy.var(logFC))
+    X = numpy.linspace(mean - (5*std),  mean + (std*5), 50000)
+    R = scipy.stats.gaussian_kde(logFC)
+    Y = R(X)
+    peakLogFC = X[Y.argmax()]
+    if peakLogFC < 0:
+        return numpy.exp(abs(peakLogFC))
+    else:
+        return 1.0/numpy.exp(abs(peakLogFC))
+
+#
+
+def _betageom_dataset(task):
+    """Returns the betageom-normalized read-counts of a single dataset, and its
+    (rho, Kp) parameters."""
+    (reads, grand_mean, bgsamples, seed) = task
+    random_state = numpy.random.RandomState(seed)
+    N = len(reads)
+    tQ = numpy.arange(0,N)/float(N)
+    eX = numpy.sort(reads)
+
+    rho = max(1.0/scipy.stats.trim_mean(eX+1, 0.001), 0.0001)
+    A = (numpy.sum(numpy.power(numpy.log(1.0-tQ),2)))/(numpy.sum(eX*numpy.log(1.0-tQ)))
+    Kp = max((2.0 * numpy.exp(A) - 1)   /(numpy.exp(A) + rho - 1), 10)
+
+    try:
+        BGsample = scipy.stats.geom.rvs(scipy.stats.beta.rvs(Kp*rho, Kp*(1-rho), size=bgsamples, random_state=random_state), size=bgsamples, random_state=random_state)
+    except Exception as e:
+        print("BGC ERROR with rho=%f, Kp=%f, A=%s" % (rho, Kp, A))
+        print(str(e))
+        BGsample = scipy.stats.geom.rvs(rho, size=bgsamples, random_state=random_state)
+
+    return (ecdf_geom_ppf(BGsample, reads, 1.0/grand_mean), (rho, Kp))
+
+#
+
+def _aBGC_dataset(task):
+    """Returns the aBGC-normalized read-counts of a single dataset, and the
+    (rho, Kp) parameters tried for each trimming fraction."""
+    (reads, S, seed) = task
+    random_state = numpy.random.RandomState(seed)
+    F = [i/100.0 for i in range(0,31) if i % 2 == 0]
+    bgc_factors = []
+
+    nzdata = reads[reads > 0]
+    nzdata.sort()
+    Nnz = len(nzdata)
+    GOF_list = []
+    for frac in F:
+        tQ = numpy.arange(0,Nnz)/float(Nnz)
+        rho = 1.0/(scipy.stats.trim_mean(nzdata, frac))
+        rho_to_fit = rho
+
+        try:
+            A = (numpy.sum(numpy.power(numpy.log(1.0-tQ),2)))/(numpy.sum(nzdata*numpy.log(1.0-tQ)))
+            Kp = (2.0 * numpy.exp(A) - 1)   /(numpy.exp(A) + rho - 1)
+            temp = scipy.stats.geom.rvs(scipy.stats.beta.rvs(Kp*rho, Kp*(1-rho), size=S, random_state=random_state), size=S, random_state=random_state)
+            bgc_factors.append((rho, Kp))
+        except Exception as e:
+            print("aBGC Error:", str(e))
+            print("%rho=s\tKp=%s\tA=%s" % (rho, Kp, A))
+            temp = scipy.stats.geom.rvs(0.01, size=S, random_state=random_state)
+
+
+        corrected_nzdata = ecdf_geom_ppf(temp, nzdata, rho_to_fit)
+        corrected_nzmean = numpy.mean(corrected_nzdata)
+
+        Fp = scipy.stats.geom.ppf(numpy.arange(1,Nnz+1)/float(Nnz), 1.0/corrected_nzmean)
+        ii_inf = Fp == float("inf")
+        Fp[ii_inf] = max(Fp[~ii_inf]) + 100
+        ch2_indiv = numpy.power(corrected_nzdata- Fp, 2)/ Fp
+        GOF = max(ch2_indiv)
+        GOF_list.append((GOF, frac, rho_to_fit, Kp))
+
+    gof, frac, best_rho, best_Kp = sorted(GOF_list)[0]
+    BGsample = scipy.stats.geom.rvs(scipy.stats.beta.rvs(best_Kp*best_rho, best_Kp*(1-best_rho), size=S, random_state=random_state), size=S, random_state=random_state)
+    return (ecdf_geom_ppf(BGsample, reads, best_rho), bgc_factors)
 
 #
 
@@ -716,6 +983,30 @@ def cleaninfgeom(x, rho):
     else:
         return x
 
+
+def ecdf_geom_ppf(S, X, rho):
+    """Maps the data through the empirical CDF of a sample, and then through the
+    inverse CDF of the geometric distribution.
+
+    Equivalent to cleaninfgeom(scipy.stats.geom.ppf(ecdf(S, x), rho), rho) for each
+    value x of the data, but the sample is sorted once and each distinct value is
+    located with a binary search.
+
+    Arguments:
+        S (numpy array): Sample defining the empirical CDF.
+        X (numpy array): Values to map.
+        rho (float): Probability of success of the geometric distribution.
+
+    Returns:
+        numpy array: Array with the mapped values, with the shape of X.
+    """
+    X = numpy.asarray(X)
+    (values, inverse) = numpy.unique(X, return_inverse=True)
+    Q = numpy.searchsorted(numpy.sort(S), values, side="right")/float(len(S))
+    ppf = scipy.stats.geom.ppf(Q, rho)
+    ppf[ppf == float("inf")] = scipy.stats.geom.ppf(0.9999999999999999, rho)
+    return ppf[inverse.ravel()].reshape(X.shape)
+
 #
 
 def norm_to_target(data, target):
@@ -746,5 +1037,39 @@ def norm_to_target(data, target):
     """
     (K,N) = data.shape
     factors = numpy.zeros((K,1))
-    factors[:,0] = float(target)/numpy.mean(data,1)
+    factors[:,0] = float(target)/numpy.asarray(data.mean(1)).ravel()
     return factors
+
+#
+
+def scale_data(data, factors):
+    """Returns the data with each dataset multiplied by its normalization factor.
+
+    Arguments:
+        data (numpy array): (K,N) numpy array (or scipy.sparse matrix) defining
+            read-counts at N sites for K datasets.
+        factors (numpy array): (K,1) numpy array with the factor of each dataset.
+
+    Returns:
+        numpy array: Array (or scipy.sparse matrix) with the scaled data.
+    """
+    if scipy.sparse.issparse(data):
+        return scipy.sparse.csc_matrix(data.multiply(factors))
+    return factors * data
+
+#
+
+def get_dense_row(data, j):
+    """Returns the read-counts of dataset j as a dense (N) numpy array.
+
+    Arguments:
+        data (numpy array): (K,N) numpy array (or scipy.sparse matrix) defining
+            read-counts at N sites for K datasets.
+        j (int): Index of the dataset.
+
+    Returns:
+        numpy array: (N) numpy array with the read-counts of dataset j.
+    """
+    if scipy.sparse.issparse(data):
+        return data[j].toarray().ravel()
+    return data[j]
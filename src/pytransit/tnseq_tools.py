@@ -1,11 +1,21 @@
 import sys
 import os
+import io
 import math
+import gzip
+import json
+import struct
+import bisect
+import hashlib
+import multiprocessing
 import warnings
 import numpy
 import scipy.stats
+import scipy.sparse
 from functools import total_ordering
 
+from pytransit import fasta_tools
+
 
 try:
     from pytransit import norm_tools
@@ -14,23 +24,147 @@ except ImportError:
     noNorm = True
     warnings.warn("Problem importing the norm_tools.py module. Read-counts will not be normalized. Some functions may not work.")
 
-def rv_siteindexes_map(genes, TASiteindexMap, nterm=0.0, cterm=0.0):
+try:
+    import zstandard
+    hasZstd = True
+except ImportError:
+    hasZstd = False
+
+# Directory for the (opt-in) cache of loaded wig matrices. Empty means caching is disabled.
+data_cache_dir = os.environ.get("TRANSIT_CACHE_DIR", "")
+
+# Number of worker processes used to parse wig files. 1 means files are read serially.
+# The value is parsed when it is used (see get_workers).
+data_workers = os.environ.get("TRANSIT_WORKERS", "1")
+
+# Type of the read-count matrices returned by the loaders (e.g. "int32" for raw
+# counts, or "float32"). Integer types truncate non-integer read-counts.
+data_dtype = os.environ.get("TRANSIT_DTYPE", "float64") or "float64"
+
+# Whether parsed annotations are also stored next to the annotation file (as
+# <annotation>.annotation.npz), so later runs can skip parsing the text.
+annotation_cache = os.environ.get("TRANSIT_ANNOTATION_CACHE", "") not in ["", "0"]
+
+# Size of the read buffer used when opening (possibly compressed) input files.
+BUFFER_SIZE = 1 << 20
+COMPRESSED_EXTENSIONS = [".gz", ".zst"]
+
+# Magic bytes, version and array alignment of TnSeq dataset bundles (see write_dataset_bundle).
+BUNDLE_MAGIC = b"TNBUNDLE"
+BUNDLE_VERSION = 1
+BUNDLE_ALIGNMENT = 64
+
+# Magic bytes and version of Genes snapshots (see Genes.save).
+GENES_MAGIC = b"TNGENES\0"
+GENES_VERSION = 1
+
+def open_file(path):
+    """Opens a text file for reading, transparently decompressing gzip or zstd files.
+
+    The compression is detected from the first bytes of the file, and the
+    content is streamed with a large read buffer (no temporary copy is made).
+
+    Arguments:
+        path (str): Path to the (possibly compressed) file.
+
+    Returns:
+        file: File object open in text mode.
+    """
+    with open(path, "rb") as f:
+        magic = f.read(4)
+    if magic[:2] == b"\x1f\x8b":
+        stream = io.BufferedReader(gzip.GzipFile(path, "rb"), buffer_size=BUFFER_SIZE)
+    elif magic == b"\x28\xb5\x2f\xfd":
+        if not hasZstd:
+            raise IOError("File '%s' is zstd-compressed. Please install the 'zstandard' python package to read it." % path)
+        raw = open(path, "rb")
+        stream = io.BufferedReader(zstandard.ZstdDecompressor().stream_reader(raw, read_size=BUFFER_SIZE, read_across_frames=True, closefd=True), buffer_size=BUFFER_SIZE)
+    else:
+        return open(path, buffering=BUFFER_SIZE)
+    return io.TextIOWrapper(stream)
+
+#
+
+def get_file_extension(path):
+    """Returns the lower-case extension of a file, ignoring compression extensions (e.g. ".gz").
+
+    Arguments:
+        path (str): Path to the file.
+
+    Returns:
+        str: Extension of the file, like ".gff3".
+    """
+    filename, file_extension = os.path.splitext(path)
+    if file_extension.lower() in COMPRESSED_EXTENSIONS:
+        filename, file_extension = os.path.splitext(filename)
+    return file_extension.lower()
+
+#
+
+def rv_siteindexes_map(genes, TASiteindexMap, nterm=0.0, cterm=0.0, slices=False):
     """
     ([Gene], {TAsite: Siteindex}) -> {Rv: Siteindex}
+
+    Returns the indexes of the sites within each gene (excluding the last codon, and
+    the given percentages of the N- and C-terminus). The trimmed bounds of all the
+    genes are computed at once, and the sites located by binary search.
+
+    Arguments:
+        genes (list): List of genes as returned by read_genes.
+        TASiteindexMap: Dictionary of site coordinate to site index, or the list (numpy
+            array) of site coordinates, where the index of each site is its position.
+        nterm (float): Percentage of the N-terminus to ignore.
+        cterm (float): Percentage of the C-terminus to ignore.
+        slices (bool): Whether to return slices instead of index arrays (only when
+            given the sorted list of site coordinates).
+
+    Returns:
+        dict: Dictionary of gene id to numpy array of site indexes (or slice), in
+            increasing order of coordinate.
     """
+    if isinstance(TASiteindexMap, dict):
+        coords = numpy.array(sorted(TASiteindexMap), dtype=numpy.int64)
+        siteindexes = numpy.array([TASiteindexMap[co] for co in coords], dtype=numpy.int64)
+    else:
+        coords = numpy.asarray(TASiteindexMap, dtype=numpy.int64)
+        siteindexes = None
+        if numpy.any(coords[1:] < coords[:-1]):
+            siteindexes = numpy.argsort(coords, kind="stable")
+            coords = coords[siteindexes]
+    if slices and siteindexes is not None:
+        raise ValueError("Slices require the sorted list of site coordinates.")
+
+    plus = numpy.array([gene["strand"] == "+" for gene in genes], dtype=bool)
+    start = numpy.array([gene["start"] for gene in genes], dtype=numpy.int64) + numpy.where(plus, 0, 3)
+    end = numpy.array([gene["end"] for gene in genes], dtype=numpy.int64) - numpy.where(plus, 3, 0)
+    length = end - start
+
+    # Offsets (from start) of the first and last coordinates whose relative position
+    # is within [nterm, 100-cterm] percent, i.e. (co-start)/length >= nterm/100 and
+    # <= (100-cterm)/100, corrected by one where rounding differs from that comparison.
+    low, high = nterm/100.0, (100 - cterm)/100.0
+    with numpy.errstate(divide="ignore", invalid="ignore"):
+        L = numpy.maximum(length, 1).astype(float)
+        first = numpy.ceil(low*L).astype(numpy.int64)
+        first -= ((first - 1)/L >= low)
+        first += (first/L < low)
+        last = numpy.floor(high*L).astype(numpy.int64)
+        last += ((last + 1)/L <= high)
+        last -= (last/L > high)
+    first = numpy.where(length > 0, numpy.maximum(first, 0), 0)
+    last = numpy.where(length > 0, numpy.minimum(last, length), length)
+
+    lo = numpy.searchsorted(coords, start + first, side="left")
+    hi = numpy.maximum(numpy.searchsorted(coords, start + last, side="right"), lo)
+
     RvSiteindexesMap = {}
     for g, gene in enumerate(genes):
-        siteindexes = []
-        start = gene["start"] if gene["strand"] == "+" else gene["start"] + 3
-        end = gene["end"] - 3 if gene["strand"] == "+" else gene["end"]
-        for i in range(start, end + 1):
-            co = i
-            if (co - start)/float(end-start) < (nterm/100.0):
-                continue
-            if (co - start)/float(end-start) > ((100 - cterm)/100.0):
-                continue
-            if co in TASiteindexMap: siteindexes.append(TASiteindexMap[co])
-        RvSiteindexesMap[gene["rv"]] = siteindexes
+        if slices:
+            RvSiteindexesMap[gene["rv"]] = slice(int(lo[g]), int(hi[g]))
+        elif siteindexes is None:
+            RvSiteindexesMap[gene["rv"]] = numpy.arange(lo[g], hi[g])
+        else:
+            RvSiteindexesMap[gene["rv"]] = siteindexes[lo[g]:hi[g]]
     return RvSiteindexesMap
 
 # format:
@@ -38,33 +172,65 @@ def rv_siteindexes_map(genes, TASiteindexMap, nterm=0.0, cterm=0.0):
 #   counts lines contain the following columns: TA coord, counts, other info like gene/annotation
 #   for each column of counts, there must be a header line prefixed by "#File: " and then an id or filename
 
-def read_combined_wig(fname):
+def read_combined_wig(fname, files=None, dtype=float, chunk_size=100000):
     """
         Read the combined wig-file generated by Transit
         :: Filename -> Tuple([Site], [WigData], [Filename])
         Site :: Integer
         WigData :: [Number]
         Filename :: String
+
+        The file is streamed in chunks of lines, and only the columns of the
+        requested files are parsed, so memory is proportional to the samples used.
+
+        Arguments:
+            fname (str): Path to the combined wig file.
+            files (list): Optional list of "#File:" names to read. Defaults to all files.
+            dtype (type): Numpy dtype of the returned counts (e.g. numpy.float32).
+            chunk_size (int): Number of lines parsed at a time.
+
+        The path may also be a TnSeq dataset bundle (see write_dataset_bundle).
     """
-    sites,countsByWig,files = [],[],[]
-    with open(fname) as f:
-        lines = f.readlines()
-        for line in lines:
-            if line.startswith("#File: "):
-                files.append(line.rstrip()[7:]) # allows for spaces in filenames
-    countsByWig = [[] for _ in files]
-    for line in lines:
-        if line[0]=='#': continue
-        cols = line.split("\t")[0:1+len(files)]
-        cols = cols[:1+len(files)] # additional columns at end could contain gene info
-        # Read in position as int, and readcounts as float
-        cols = list(map(lambda t_iv: int(t_iv[1]) if t_iv[0] == 0 else float(t_iv[1]), enumerate(cols)))
-        position, wigCounts = cols[0], cols[1:]
-        sites.append(position)
-        for i, c in enumerate(wigCounts):
-            countsByWig[i].append(c)
-
-    return (numpy.array(sites), numpy.array(countsByWig), files)
+    if is_dataset_bundle(fname):
+        bundle = read_dataset_bundle(fname)
+        selected = set(bundle["files"] if files is None else files)
+        rows = [j for j,name in enumerate(bundle["files"]) if name in selected]
+        return (numpy.array(bundle["position"]), bundle["data"][rows].astype(dtype), [bundle["files"][j] for j in rows])
+
+    all_files = []
+    columns = None
+    sites, countsByWig, lines = [], [], []
+
+    def parse_chunk():
+        rows = [line.rstrip("\r\n").split("\t", last_column+1) for line in lines]
+        sites.append(numpy.array([row[0] for row in rows], dtype=int))
+        countsByWig.append(numpy.array([[row[c] for c in columns] for row in rows], dtype=dtype).reshape(len(rows), len(columns)).T)
+        del lines[:]
+
+    with open_file(fname) as f:
+        for line in f:
+            if line[0]=='#':
+                if line.startswith("#File: "):
+                    all_files.append(line.rstrip()[7:]) # allows for spaces in filenames
+                continue
+            if not line.strip(): continue
+            if columns is None:
+                # Columns to parse; additional columns at end could contain gene info
+                if files is None:
+                    columns = [i+1 for i in range(len(all_files))]
+                else:
+                    selected = set(files)
+                    columns = [i+1 for i,name in enumerate(all_files) if name in selected]
+                last_column = max(columns + [0])
+            lines.append(line)
+            if len(lines) >= chunk_size: parse_chunk()
+    if columns is None: columns = []
+    if lines: parse_chunk()
+
+    selected_files = [all_files[c-1] for c in columns]
+    if not sites:
+        return (numpy.zeros(0, dtype=int), numpy.zeros((len(columns), 0), dtype=dtype), selected_files)
+    return (numpy.concatenate(sites), numpy.concatenate(countsByWig, axis=1), selected_files)
 
 def read_samples_metadata(metadata_file, covarsToRead = [], interactionsToRead = [], condition_name="Condition"):
     """
@@ -80,7 +246,11 @@ def read_samples_metadata(metadata_file, covarsToRead = [], interactionsToRead =
     interactionsByFileList = [{} for i in range(len(interactionsToRead))]
     headersToRead = [condition_name.lower(), "filename"]
     orderingMetadata = { 'condition': [], 'interaction': [] }
-    with open(metadata_file) as mfile:
+    if is_dataset_bundle(metadata_file):
+        mfile = io.StringIO(read_dataset_bundle(metadata_file)["metadata"])
+    else:
+        mfile = open_file(metadata_file)
+    with mfile:
         lines = mfile.readlines()
         headIndexes = [i
                 for h in headersToRead
@@ -117,17 +287,17 @@ def read_genes(fname,descriptions=False):
       (Filename, Options) -> [Gene]
       Gene :: {start, end, rv, gene, strand}
     """
+    index = get_annotation_index(fname)
     genes = []
-    for line in open(fname):
-        w = line.rstrip().split('\t')
+    for orf,(name,desc,start,end,strand) in zip(index.orfs, index.info):
         data = {
-                "start": int(w[1]),
-                "end": int(w[2]),
-                "rv": w[8],
-                "gene": w[7],
-                "strand": w[3]
+                "start": start,
+                "end": end,
+                "rv": orf,
+                "gene": name,
+                "strand": strand
                 }
-        if descriptions==True: data.append(w[0])
+        if descriptions==True: data["desc"] = desc
         genes.append(data)
     return genes
 
@@ -320,6 +490,79 @@ class Gene:
 
 #
 
+class GeneView(Gene):
+    """Gene whose read-counts and coordinates are views into the data of a Genes object.
+
+    Only the information of the gene and the range of its sites are stored. The
+    reads and positions are views of the site matrix shared by all the genes, and
+    statistics (k, n, r, s and t) are those computed in bulk by the Genes object.
+    The runs are computed the first time they are used. Provides the same
+    attributes and methods as Gene.
+
+    .. seealso:: :class:`Gene` :class:`Genes`
+    """
+
+    # Statistics taken from the Genes object (computed for all genes at once)
+    STATS = ["k", "n", "r", "s", "t"]
+
+    def __init__(self, genes, i, orf, name, desc, start=0, end=0, strand=""):
+        """Initializes the view of a gene.
+
+        Arguments:
+            genes (Genes): Genes object holding the data.
+            i (int): Index of the gene in the Genes object.
+            orf (str): A string defining the ID of the gene.
+            name (str): A string with the human readable name of the gene.
+            desc (str): A string with the description of the gene.
+            start (int): An integer defining the start coordinate for the gene.
+            end (int): An integer defining the end coordinate for the gene.
+            strand (str): A string defining the strand of the gene.
+        """
+        self.orf = orf
+        self.name = name
+        self.desc = desc
+        self.start = start
+        self.end = end
+        self.strand = strand
+        self._genes = genes
+        self._index = i
+
+#
+
+    @property
+    def reads(self):
+        """Read-counts at the sites of the gene (a view of the data of the Genes object)."""
+        return self._genes.get_gene_reads(self._index)
+
+#
+
+    @property
+    def position(self):
+        """Coordinates of the sites of the gene (a view of the positions of the Genes object)."""
+        return self._genes.get_gene_position(self._index)
+
+#
+
+    @property
+    def tosses(self):
+        """Sites of the gene represented as bernoulli trials (see tossify)."""
+        return tossify(self.reads)
+
+#
+
+    def __getattr__(self, attr):
+        """Returns the statistics of the gene, and computes its runs the first time they are accessed."""
+        if "_genes" not in self.__dict__:
+            raise AttributeError("'%s' object has no attribute '%s'" % (type(self).__name__, attr))
+        if attr in self.STATS:
+            return int(getattr(self._genes, attr)[self._index])
+        if attr == "runs":
+            self.runs = runs(self.tosses)
+            return self.runs
+        raise AttributeError("'%s' object has no attribute '%s'" % (type(self).__name__, attr))
+
+#
+
 class Genes:
     """Class defining a list of Gene objects with useful attributes for TnSeq
     analysis.
@@ -339,7 +582,15 @@ class Genes:
         cterm: Float number of the fraction of the C-terminus to ignore.
         include_nc: Boolean determining whether to include non-coding areas.
         orf2index: Dictionary of orf id to index in the genes list.
-        genes: List of the Gene objects.
+        genes: List of the Gene objects (GeneView).
+        data: Matrix (datasets x sites) with the read-counts of all the sites.
+        position: Numpy array with the coordinates of the sites.
+        site_start: Numpy array with the index of the first site of each gene.
+        site_end: Numpy array with the index past the last site of each gene. The
+            sites of gene i are data[:, site_start[i]:site_end[i]].
+        k, n, r, s, t: Numpy arrays with the number of insertions, number of sites,
+            maximum run of non-insertions, span of the maximum run and span of the
+            sites of each gene (see Gene).
 
 
     :Example:
@@ -424,7 +675,7 @@ class Genes:
 
 #
 
-    def __init__(self, wigList, annotation, norm="nonorm", reps="All", minread=1, ignoreCodon = True, nterm=0.0, cterm=0.0, include_nc = False, data=[], position=[],genome="", transposon="himar1"):
+    def __init__(self, wigList, annotation, norm="nonorm", reps="All", minread=1, ignoreCodon = True, nterm=0.0, cterm=0.0, include_nc = False, data=[], position=[],genome="", transposon="himar1", dtype=None):
         """Initializes the gene list based on the list of wig files and a prot_table.
 
         This class helps define a list of Gene objects with attributes that
@@ -441,8 +692,10 @@ class Genes:
             nterm (float): Float number of the fraction of the N-terminus to ignore.
             cterm (float): Float number of the fraction of the C-terminus to ignore.
             include_nc (bool): Boolean determining whether to include non-coding areas.
-            data (list): List of data. Used to define the object without files.
+            data (list): List of data. Used to define the object without files. May be a scipy.sparse matrix.
             position (list): List of position of sites. Used to define the object without files.
+            dtype (str/type): Type of the (normalized) data kept in the object, e.g. "float32"
+                (see norm_tools.normalize_data).
 
 
         """
@@ -456,30 +709,35 @@ class Genes:
         self.cterm = cterm
         self.include_nc = include_nc
 
-        isProt = True
-        filename, file_extension = os.path.splitext(self.annotation)
-        if file_extension.lower() in [".gff", ".gff3"]:
-            isProt = False
-
         self.orf2index = {}
         self.genes = []
 
-        orf2info = get_gene_info(self.annotation)
-        if not numpy.any(data):
+        # A snapshot written by Genes.save can be given instead of the wig files
+        if not scipy.sparse.issparse(data) and not numpy.any(data) and len(wigList) == 1 and is_genes_snapshot(wigList[0]):
+            self.read_snapshot(wigList[0], annotation=annotation, ignoreCodon=ignoreCodon, nterm=nterm, cterm=cterm)
+            return
+
+        # The annotation is parsed once (and memoized) into an interval index
+        index = get_annotation_index(self.annotation)
+        orf2info = index.get_gene_info()
+        if not scipy.sparse.issparse(data) and not numpy.any(data):
             if transposon.lower() == "himar1" and not genome:
-                (data, position) = get_data(self.wigList)
+                (data, position) = get_cached_data(self.wigList)
             elif genome:
-                (data, position) = get_data_w_genome(self.wigList, genome)
+                (data, position) = get_cached_data(self.wigList, "genome", genome)
             else:
-                (data, position) = get_data_zero_fill(self.wigList)
+                (data, position) = get_cached_data(self.wigList, "zero_fill")
 
-        ii_min = data < self.minread
-        data[ii_min] = 0
-
-        hash = get_pos_hash(self.annotation)
+        if scipy.sparse.issparse(data):
+            data = scipy.sparse.csc_matrix(data, copy=True)
+            data.data[data.data < self.minread] = 0
+            data.eliminate_zeros()
+        else:
+            ii_min = data < self.minread
+            data[ii_min] = 0
 
         if not noNorm:
-            (data, factors) = norm_tools.normalize_data(data, norm, self.wigList, self.annotation)
+            (data, factors) = norm_tools.normalize_data(data, norm, self.wigList, self.annotation, dtype=dtype)
         else:
             factors = []
 
@@ -488,53 +746,219 @@ class Genes:
 
         K,N = data.shape
 
+        # A single site matrix is kept; genes are views of a range of its sites
         self.data = data
-        orf2posindex = {}
-        visited_list = []
-        for i in range(N):
-            genes_with_coord = hash.get(position[i], [])
-            for gene in genes_with_coord:
-                if gene not in orf2posindex: visited_list.append(gene)
-                if gene not in orf2posindex: orf2posindex[gene] = []
-
-                name,desc,start,end,strand = orf2info.get(gene, ["", "", 0, 0, "+"])
-
-                if strand == "+":
-                    if self.ignoreCodon and position[i] > end - 3:
-                        continue
-                else:
-                    if self.ignoreCodon and position[i] < start + 3:
-                        continue
+        self.position = numpy.asarray(position, dtype=int)
+        self.set_genes(index, orf2info)
+
+#
+
+    def set_genes(self, index, orf2info):
+        """Assigns the sites to the genes of the annotation, and computes their statistics.
+
+        Arguments:
+            index (AnnotationIndex): Index of the genes of the annotation.
+            orf2info (dict): Dictionary of gene id to gene information (see get_gene_info).
+        """
+        self.orf2index = {}
+        self.genes = []
+        (first, last) = self.get_site_ranges(index, orf2info, self.position)
+
+        G = len(index.orfs)
+        self.site_start = numpy.zeros(G, dtype=numpy.int64)
+        self.site_end = numpy.zeros(G, dtype=numpy.int64)
+        for (i, gene) in enumerate(index.orfs):
+            name,desc,start,end,strand = orf2info[gene]
+            if gene in first:
+                self.site_start[i] = first[gene]
+                self.site_end[i] = last[gene] + 1
+            self.genes.append(GeneView(self, i, gene, name, desc, start, end, strand))
+            self.orf2index[gene] = i
+
+        # Insertion and run statistics of all the genes, in one pass
+        if scipy.sparse.issparse(self.data):
+            tosses = numpy.asarray(self.data.sum(0)).ravel() > 0
+        else:
+            tosses = numpy.sum(self.data, 0) > 0
+        (self.k, self.n, self.r, self.s, self.t) = get_gene_run_stats(tosses, self.position, self.site_start, self.site_end)
+
+#
 
-                if (position[i]-start)/float(end-start) < (self.nterm/100.0):
-                    continue
+    def save(self, path):
+        """Writes the object to a binary snapshot, so it can be reused without reading
+        and normalizing the datasets again.
 
-                if (position[i]-start)/float(end-start) > ((100-self.cterm)/100.0):
-                    continue
+        The snapshot holds the (normalized) site matrix, the coordinates of the sites,
+        the range of sites and statistics of each gene, the gene information and the
+        parameters used to build the object. It can be loaded with Genes.load, or
+        given to Genes (and to the methods) in place of the list of wig files.
 
-                orf2posindex[gene].append(i)
+        Arguments:
+            path (str): Path to the output file, or a file object opened in binary mode.
 
-        count = 0
-        for line in open(self.annotation):
-            if line.startswith("#"): continue
-            tmp = line.split("\t")
+        :Example:
 
-            if isProt:
-                gene = tmp[8].strip()
-                name,desc,start,end,strand = orf2info.get(gene, ["", "", 0, 0, "+"])
-            else:
-                features = dict([tuple(f.split("=",1)) for f in filter(lambda x: "=" in x, tmp[8].split(";"))])
-                gene = features["ID"]
-                name,desc,start,end,strand = orf2info.get(gene, ["", "", 0, 0, "+"])
-            posindex = orf2posindex.get(gene, [])
-            if posindex:
-                pos_start = orf2posindex[gene][0]
-                pos_end = orf2posindex[gene][-1]
-                self.genes.append(Gene(gene, name, desc, data[:, pos_start:pos_end+1], position[pos_start:pos_end+1], start, end, strand))
-            else:
-                self.genes.append(Gene(gene, name, desc, numpy.array([[]]), numpy.array([]), start, end, strand))
-            self.orf2index[gene] = count
-            count += 1
+            >>> import pytransit.tnseq_tools as tnseq_tools
+            >>> G = tnseq_tools.Genes(["transit/data/glycerol_H37Rv_rep1.wig"], "transit/genomes/H37Rv.prot_table", norm="TTR")
+            >>> G.save("glycerol_TTR.genes")
+            >>> G = tnseq_tools.Genes.load("glycerol_TTR.genes")
+        """
+        header = {"version": GENES_VERSION, "wigList": list(self.wigList), "annotation": self.annotation,
+                  "norm": self.norm, "reps": self.reps, "minread": float(self.minread),
+                  "ignoreCodon": bool(self.ignoreCodon), "nterm": float(self.nterm), "cterm": float(self.cterm),
+                  "include_nc": bool(self.include_nc), "sparse": scipy.sparse.issparse(self.data),
+                  "shape": list(self.data.shape),
+                  "genes": [[g.orf, g.name, g.desc, g.start, g.end, g.strand] for g in self.genes]}
+        arrays = {"position": self.position, "site_start": self.site_start, "site_end": self.site_end,
+                  "k": self.k, "n": self.n, "r": self.r, "s": self.s, "t": self.t}
+        if header["sparse"]:
+            data = scipy.sparse.csc_matrix(self.data)
+            arrays.update({"data": data.data, "indices": data.indices, "indptr": data.indptr})
+        else:
+            arrays["data"] = numpy.asarray(self.data)
+        write_binary_arrays(path, GENES_MAGIC, header, arrays)
+
+#
+
+    @classmethod
+    def load(self, path, mmap=True):
+        """Returns the Genes object stored in a snapshot (see Genes.save).
+
+        Arguments:
+            path (str): Path to the snapshot.
+            mmap (bool): Memory-map the arrays (copy-on-write) instead of reading them.
+
+        Returns:
+            Genes: Object with the data, genes and parameters of the snapshot.
+        """
+        G = self.__new__(self)
+        G.read_snapshot(path, mmap=mmap)
+        return G
+
+#
+
+    def read_snapshot(self, path, mmap=True, annotation=None, ignoreCodon=None, nterm=None, cterm=None):
+        """Sets the data, genes and parameters of the object from a snapshot (see Genes.save).
+
+        If an annotation or trimming parameters different from those of the snapshot are
+        given, the sites are assigned to the genes again (the data is not normalized again).
+
+        Arguments:
+            path (str): Path to the snapshot.
+            mmap (bool): Memory-map the arrays (copy-on-write) instead of reading them.
+            annotation (str): Path to the annotation. Defaults to that of the snapshot.
+            ignoreCodon (bool): Whether to ignore the start/stop codon. Defaults to that of the snapshot.
+            nterm (float): Fraction of the N-terminus to ignore. Defaults to that of the snapshot.
+            cterm (float): Fraction of the C-terminus to ignore. Defaults to that of the snapshot.
+        """
+        snapshot = read_binary_arrays(path, GENES_MAGIC, GENES_VERSION, mmap)
+        self.wigList = snapshot["wigList"]
+        self.norm = snapshot["norm"]
+        self.reps = snapshot["reps"]
+        self.minread = snapshot["minread"]
+        self.include_nc = snapshot["include_nc"]
+        self.annotation = annotation if annotation is not None else snapshot["annotation"]
+        self.ignoreCodon = ignoreCodon if ignoreCodon is not None else snapshot["ignoreCodon"]
+        self.nterm = nterm if nterm is not None else snapshot["nterm"]
+        self.cterm = cterm if cterm is not None else snapshot["cterm"]
+
+        if snapshot["sparse"]:
+            self.data = scipy.sparse.csc_matrix((snapshot["data"], snapshot["indices"], snapshot["indptr"]), shape=tuple(snapshot["shape"]))
+        else:
+            self.data = snapshot["data"]
+        self.position = snapshot["position"]
+
+        same_annotation = os.path.abspath(self.annotation) == os.path.abspath(snapshot["annotation"])
+        same_trimming = (bool(self.ignoreCodon), float(self.nterm), float(self.cterm)) == (snapshot["ignoreCodon"], snapshot["nterm"], snapshot["cterm"])
+        if not (same_annotation and same_trimming):
+            index = get_annotation_index(self.annotation)
+            self.set_genes(index, index.get_gene_info())
+            return
+
+        self.site_start = snapshot["site_start"]
+        self.site_end = snapshot["site_end"]
+        (self.k, self.n, self.r, self.s, self.t) = (snapshot["k"], snapshot["n"], snapshot["r"], snapshot["s"], snapshot["t"])
+        self.orf2index = {}
+        self.genes = []
+        for (i, (orf, name, desc, start, end, strand)) in enumerate(snapshot["genes"]):
+            self.genes.append(GeneView(self, i, sys.intern(orf), name, desc, start, end, strand))
+            self.orf2index[orf] = i
+
+#
+
+    def get_gene_reads(self, i):
+        """Returns the read-counts at the sites of a gene.
+
+        Arguments:
+            i (int): Index of the gene.
+
+        Returns:
+            narray: Matrix (datasets x sites of the gene). A view of the data, unless
+                the data is a scipy.sparse matrix.
+        """
+        reads = self.data[:, self.site_start[i]:self.site_end[i]]
+        if scipy.sparse.issparse(reads): reads = reads.toarray()
+        return reads
+
+#
+
+    def get_gene_position(self, i):
+        """Returns the coordinates of the sites of a gene.
+
+        Arguments:
+            i (int): Index of the gene.
+
+        Returns:
+            narray: View of the coordinates of the sites of the gene.
+        """
+        return self.position[self.site_start[i]:self.site_end[i]]
+
+#
+
+    def get_site_ranges(self, index, orf2info, position):
+        """Returns the range of sites assigned to each gene.
+
+        All sites are mapped to the genes that overlap them at once, and the sites
+        excluded by ignoreCodon, nterm and cterm are masked out.
+
+        Arguments:
+            index (AnnotationIndex): Index of the genes of the annotation.
+            orf2info (dict): Dictionary of gene id to gene information (see get_gene_info).
+            position (list): List of coordinates of the sites.
+
+        Returns:
+            tuple: Dictionaries of gene id to the index of its first and last site.
+        """
+        position = numpy.asarray(position, dtype=numpy.int64)
+        (indptr, genes) = index.genes_at_positions(position)
+        site = numpy.repeat(numpy.arange(len(position)), numpy.diff(indptr))
+
+        # Coordinates and strand of each gene, taken from its gene information
+        orfs = list(dict.fromkeys(index.orfs))
+        orf2id = dict([(orf, i) for (i, orf) in enumerate(orfs)])
+        orf_ids = numpy.array([orf2id[orf] for orf in index.orfs], dtype=int)
+        starts = numpy.array([orf2info[orf][2] for orf in orfs], dtype=float)
+        ends = numpy.array([orf2info[orf][3] for orf in orfs], dtype=float)
+        plus = numpy.array([orf2info[orf][4] == "+" for orf in orfs], dtype=bool)
+
+        gene = orf_ids[genes] if len(genes) else numpy.zeros(0, dtype=int)
+        pos = position[site]
+        (start, end) = (starts[gene], ends[gene])
+        keep = numpy.ones(len(site), dtype=bool)
+        if self.ignoreCodon:
+            keep &= numpy.where(plus[gene], pos <= end - 3, pos >= start + 3)
+        with numpy.errstate(divide="ignore", invalid="ignore"):
+            fraction = (pos - start) / (end - start)
+        keep &= ~(fraction < (self.nterm/100.0))
+        keep &= ~(fraction > ((100-self.cterm)/100.0))
+
+        (site, gene) = (site[keep], gene[keep])
+        first = numpy.full(len(orfs), len(position))
+        last = numpy.full(len(orfs), -1)
+        numpy.minimum.at(first, gene, site)
+        numpy.maximum.at(last, gene, site)
+        assigned = numpy.flatnonzero(last >= 0)
+        return (dict([(orfs[g], int(first[g])) for g in assigned]), dict([(orfs[g], int(last[g])) for g in assigned]))
 
 #
 
@@ -544,11 +968,7 @@ class Genes:
         Returns:
             narray: Numpy array with the number of insertions for all genes.
         """
-        G = len(self.genes)
-        K = numpy.zeros(G)
-        for i in range(G):
-            K[i] = self.genes[i].k
-        return K
+        return self.k.astype(float)
 
 #
 
@@ -558,11 +978,7 @@ class Genes:
         Returns:
             narray: Numpy array with the number of sites for all genes.
         """
-        G = len(self.genes)
-        N = numpy.zeros(G)
-        for i in range(G):
-            N[i] = self.genes[i].n
-        return N
+        return self.n.astype(float)
 
 #
 
@@ -572,11 +988,7 @@ class Genes:
         Returns:
             narray: Numpy array with the max run of non-insertions for all genes.
         """
-        G = len(self.genes)
-        R = numpy.zeros(G)
-        for i in range(G):
-            R[i] = self.genes[i].r
-        return R
+        return self.r.astype(float)
 
 #
 
@@ -587,11 +999,7 @@ class Genes:
         Returns:
             narray: Numpy array with the span of gap for all genes.
         """
-        G = len(self.genes)
-        S = numpy.zeros(G)
-        for i in range(G):
-            S[i] = self.genes[i].s
-        return S
+        return self.s.astype(float)
 
 #
 
@@ -602,11 +1010,7 @@ class Genes:
         Returns:
             narray: Numpy array with the span of gene for all genes.
         """
-        G = len(self.genes)
-        T = numpy.zeros(G)
-        for i in range(G):
-            T[i] = self.genes[i].t
-        return T
+        return self.t.astype(float)
 
 #
 
@@ -630,10 +1034,8 @@ class Genes:
         Returns:
             narray: Numpy array with the density for all genes.
         """
-        G = len(self.genes)
-        theta = numpy.zeros(G)
-        for i in range(G):
-            theta[i] = self.genes[i].theta()
+        theta = numpy.zeros(len(self.genes))
+        numpy.divide(self.k, self.n, out=theta, where=self.n > 0)
         return theta
 
 #
@@ -644,7 +1046,7 @@ class Genes:
         Returns:
             narray: Numpy array with the complement of density for all genes.
         """
-        return 1.0 - self.theta()
+        return 1.0 - self.local_thetas()
 
 #
 
@@ -654,11 +1056,7 @@ class Genes:
         Returns:
             float: Total sum of reads across all genes.
         """
-        G = len(self.genes)
-        total = 0
-        for i in range(G):
-            total += self.genes[i].k
-        return total
+        return int(numpy.sum(self.k))
 
 #
 
@@ -668,11 +1066,7 @@ class Genes:
         Returns:
             int: Total number of sites across all genes.
         """
-        G = len(self.genes)
-        total = 0
-        for i in range(G):
-            total += self.genes[i].n
-        return total
+        return int(numpy.sum(self.n))
 
 #
 
@@ -682,7 +1076,9 @@ class Genes:
         Returns:
             int: Max run across all genes.
         """
-        return maxrun(self.tosses())
+        tosses = numpy.array(self.tosses())
+        (k, n, r, s, t) = get_gene_run_stats(tosses, numpy.arange(len(tosses)), [0], [len(tosses)])
+        return int(r[0])
 
 #
 
@@ -735,10 +1131,10 @@ class Genes:
         Returns:
             list: Sites represented as bernoulli trials with insertions as true.
         """
-        all_tosses = []
-        for g in self.genes:
-            all_tosses.extend(g.tosses)
-        return all_tosses
+        sites = numpy.concatenate([numpy.arange(a, b) for (a, b) in zip(self.site_start, self.site_end)] + [numpy.zeros(0, dtype=int)])
+        reads = self.data[:, sites]
+        if scipy.sparse.issparse(reads): reads = reads.toarray()
+        return tossify(reads).tolist()
 
 #
 
@@ -811,21 +1207,99 @@ def runindex(runs):
 
 #
 
-def get_file_types(wig_list):
-    """Returns the transposon type (himar1/tn5) of the list of wig files.
+def get_gene_run_stats(tosses, position, site_start, site_end):
+    """Returns the insertion and run statistics of many genes at once.
+
+    The sites of all the genes are concatenated, and the runs of non-insertions
+    are found with a run-length encoding of the concatenated vector that is broken
+    at the boundaries of the genes. Equivalent to the k, n, r, s and t attributes
+    of Gene, but without looping over the genes.
 
     Arguments:
-        wig_list (list): List of paths to wig files.
+        tosses (list): Insertion (>0) or not at each site (see tossify).
+        position (list): Coordinates of the sites.
+        site_start (list): Index of the first site of each gene.
+        site_end (list): Index past the last site of each gene.
 
     Returns:
-        list: List of transposon type ("himar1" or "tn5").
+        tuple: Numpy arrays with the number of insertions (k), number of sites (n),
+            maximum run of non-insertions (r), span of the maximum run (s) and span
+            of the sites (t) of each gene.
     """
-    if not wig_list:
-        return []
+    tosses = numpy.asarray(tosses) > 0
+    position = numpy.asarray(position, dtype=numpy.int64)
+    site_start = numpy.asarray(site_start, dtype=numpy.int64)
+    site_end = numpy.asarray(site_end, dtype=numpy.int64)
+    G = len(site_start)
+    n = numpy.maximum(site_end - site_start, 0)
+
+    # Concatenated sites of all the genes, and the gene of each of them
+    gene = numpy.repeat(numpy.arange(G), n)
+    offset = numpy.arange(len(gene)) - numpy.repeat(numpy.cumsum(n) - n, n)
+    site = site_start[gene] + offset
+    inserted = tosses[site]
+    k = numpy.bincount(gene, weights=inserted, minlength=G).astype(int)
+
+    # Runs of non-insertions, broken at the boundaries of the genes
+    first = numpy.ones(len(site), dtype=bool)
+    first[1:] = (gene[1:] != gene[:-1]) | inserted[:-1]
+    last = numpy.ones(len(site), dtype=bool)
+    last[:-1] = (gene[1:] != gene[:-1]) | inserted[1:]
+    run_start = numpy.flatnonzero(first & ~inserted)
+    run_end = numpy.flatnonzero(last & ~inserted)
+    run_length = run_end - run_start + 1
+    run_gene = gene[run_start]
+
+    r = numpy.zeros(G, dtype=int)
+    numpy.maximum.at(r, run_gene, run_length)
+
+    # The span of the last of the longest runs of each gene
+    longest = numpy.full(G, -1)
+    is_max = run_length == r[run_gene]
+    numpy.maximum.at(longest, run_gene[is_max], numpy.flatnonzero(is_max))
+    s = numpy.zeros(G, dtype=int)
+    has_run = longest >= 0
+    s[has_run] = position[site[run_end[longest[has_run]]]] - position[site[run_start[longest[has_run]]]] + 2
+
+    t = numpy.zeros(G, dtype=int)
+    has_sites = n > 0
+    t[has_sites] = position[site_end[has_sites] - 1] - position[site_start[has_sites]] + 2
+    return (k, n.astype(int), r, s, t)
+
+#
+
+# Memoized formats of the scanned wig files (see scan_wig_format), keyed by path
+# and invalidated by size/mtime.
+_wig_format_cache = {}
+
+def scan_wig_format(path):
+    """Returns the transposon type of a wig file, and whether it includes empty sites.
 
-    types = ['tn5' for i in range(len(wig_list))]
-    for i, wig_filename in enumerate(wig_list):
-        with open(wig_filename) as wig_file:
+    The file is read only until both are known: usually the first lines of a
+    himar1 dataset, and the whole file only for Tn5 datasets without empty sites.
+    Results are memoized for the process (and rebuilt if the size or modification
+    time of the file changes).
+
+    Arguments:
+        path (str): Path to the wig file.
+
+    Returns:
+        dict: Dictionary with the transposon type ("type": "himar1" or "tn5"), and
+            whether it includes empty sites ("includes_zeros").
+    """
+    key = os.path.abspath(path)
+    st = os.stat(path)
+    signature = (st.st_size, st.st_mtime_ns)
+    if key in _wig_format_cache and _wig_format_cache[key][0] == signature:
+        return _wig_format_cache[key][1]
+
+    if is_dataset_bundle(path):
+        # Bundles hold complete matrices of read-counts at every site
+        wig_format = {"type": read_dataset_bundle(path)["transposon"], "includes_zeros": True}
+    else:
+        is_tn5 = True
+        includes_zeros = False
+        with open_file(path) as wig_file:
             prev_pos = 0
             for line in wig_file:
                 if line[0] not in "0123456789": continue
@@ -833,10 +1307,29 @@ def get_file_types(wig_list):
                 pos = int(tmp[0])
                 rd = float(tmp[1])
                 if pos != prev_pos + 1:
-                    types[i] = 'himar1'
+                    is_tn5 = False
+                if rd == 0:
+                    includes_zeros = True
+                if not is_tn5 and includes_zeros:
                     break
                 prev_pos = pos
-    return types
+        wig_format = {"type": "tn5" if is_tn5 else "himar1", "includes_zeros": includes_zeros}
+
+    _wig_format_cache[key] = (signature, wig_format)
+    return wig_format
+
+#
+
+def get_file_types(wig_list):
+    """Returns the transposon type (himar1/tn5) of the list of wig files.
+
+    Arguments:
+        wig_list (list): List of paths to wig files.
+
+    Returns:
+        list: List of transposon type ("himar1" or "tn5").
+    """
+    return [scan_wig_format(path)["type"] for path in wig_list]
 
 def check_wig_includes_zeros(wig_list):
     """Returns boolean list showing whether the given files include empty sites
@@ -848,20 +1341,7 @@ def check_wig_includes_zeros(wig_list):
     Returns:
         list: List of boolean values.
     """
-    if not wig_list:
-        return []
-    includes = [False for i in range(len(wig_list))]
-    for i, wig_filename in enumerate(wig_list):
-        with open(wig_filename) as wig_file:
-            for line in wig_file:
-                if line[0] not in "0123456789": continue
-                tmp = line.split()
-                pos = int(tmp[0])
-                rd = float(tmp[1])
-                if rd == 0:
-                    includes[i] = True
-                    break
-    return includes
+    return [scan_wig_format(path)["includes_zeros"] for path in wig_list]
 
 
 
@@ -877,163 +1357,753 @@ def get_unknown_file_types(wig_list, transposons):
 
 #
 
-def get_data(wig_list):
-    """ Returns a tuple of (data, position) containing a matrix of raw read-counts
-        , and list of coordinates.
+def read_wig(path):
+    """ Returns a tuple of (position, reads) with the coordinates and read-counts
+        of a single wig file, read in one pass.
 
     Arguments:
-        wig_list (list): List of paths to wig files.
+        path (str): Path to the wig file.
 
     Returns:
-        tuple: Two lists containing data and positions of the wig files given.
+        tuple: Numpy arrays with the integer coordinates and the float read-counts.
 
     :Example:
 
         >>> import pytransit.tnseq_tools as tnseq_tools
-        >>> (data, position) = tnseq_tools.get_data(["data/glycerol_H37Rv_rep1.wig", "data/glycerol_H37Rv_rep2.wig"])
-        >>> print(data)
-        array([[ 0.,  0.,  0., ...,  0.,  0.,  0.],
-               [ 0.,  0.,  0., ...,  0.,  0.,  0.]])
+        >>> (position, reads) = tnseq_tools.read_wig("data/glycerol_H37Rv_rep1.wig")
+        >>> print(position)
+        array([     60,      72,     102, ..., 4411333, 4411424, 4411426])
 
-    .. seealso:: :class:`get_file_types` :class:`combine_replicates` :class:`get_data_zero_fill` :class:`pytransit.norm_tools.normalize_data`
+    .. seealso:: :class:`get_data` :class:`get_data_zero_fill` :class:`get_data_w_genome`
     """
-    K = len(wig_list)
+    with open_file(path) as wig_file:
+        lines = [line for line in wig_file if line[0] in "0123456789"]
+
+    if not lines:
+        return (numpy.zeros(0, dtype=int), numpy.zeros(0))
+
+    # Fast path: every line has exactly two columns, so the whole file can be
+    # converted in a single call. Otherwise, keep only the first two columns.
+    text = "".join(lines)
+    values = text.split()
+    if len(values) == 2*len(lines) and (count_line_columns(text, len(lines)) == 2).all():
+        values = numpy.array(values, dtype=float).reshape(len(lines), 2)
+    else:
+        values = numpy.array([line.split()[:2] for line in lines], dtype=float)
+    return (values[:,0].astype(int), values[:,1])
 
-    # If empty just quickly return empty lists
-    if not wig_list:
-        return (numpy.zeros((1,0)), numpy.zeros(0), [])
+#
 
-    # Check size of all wig file matches
-    size_list = []
-    for j,path in enumerate(wig_list):
-        T = 0
-        for line in open(path):
-            if line[0] not in "0123456789": continue
-            T+=1
-        size_list.append(T)
-
-    # If it doesn't match, report an error and quit
-    if sum(size_list) != (T * len(size_list)):
-        print("Error: Not all wig files have the same number of sites.")
-        print("       Make sure all .wig files come from the same strain.")
-        sys.exit()
+def count_line_columns(text, N):
+    """Returns the number of whitespace-separated columns of each line of the text.
 
-    data = numpy.zeros((K,T))
-    position = numpy.zeros(T, dtype=int)
-    for j,path in enumerate(wig_list):
-        reads = []
-        i = 0
-        prev_pos = 0
-        for line in open(path):
-            if line[0] not in "0123456789": continue
-            tmp = line.split()
-            pos = int(tmp[0])
-            rd = float(tmp[1])
-            prev_pos = pos
+    Arguments:
+        text (str): Text with N lines.
+        N (int): Number of lines in the text.
 
-            try:
-                data[j,i] = rd
-            except Exception as e:
-                print("Error: %s" % e)
-                print("")
-                print("Make sure that all wig files have the same number of TA sites (i.e. same strain)")
-                sys.exit()
-            position[i] = pos
-            i+=1
-    return (data, position)
+    Returns:
+        numpy array: Array with the number of columns of each line.
+    """
+    chars = numpy.frombuffer(text.encode("ascii", "replace"), dtype=numpy.uint8)
+    space = chars <= 32
+    starts = ~space & numpy.concatenate(([True], space[:-1]))
+    newline = chars == 10
+    line = numpy.cumsum(newline) - newline
+    return numpy.bincount(line[starts], minlength=N)[:N]
 
 #
 
-def get_data_zero_fill(wig_list):
-    """ Returns a tuple of (data, position) containing a matrix of raw read counts,
-        and list of coordinates. Positions that are missing are filled in as zero.
+def get_dtype(dtype):
+    """Returns the numpy type to use for a read-count matrix.
 
     Arguments:
-        wig_list (list): List of paths to wig files.
+        dtype (str/type): Requested type. None means data_dtype.
 
     Returns:
-        tuple: Two lists containing data and positions of the wig files given.
+        numpy.dtype: Type of the matrix.
     """
+    if dtype is None:
+        dtype = data_dtype
+    return numpy.dtype(dtype)
 
-    K = len(wig_list)
-    T = 0
-
-    if not wig_list:
-        return (numpy.zeros((1,0)), numpy.zeros(0), [])
+#
 
-    #NOTE:  This might be slow as we need to find the last insertion site
-    #       over all the replicates. This might be an area to attempt to optimize.
-    last_line = ''
-    for wig_name in wig_list:
-        for line in open(wig_name):
-            if line[0] not in "0123456789": continue
-            last_line = line
-        pos = int(last_line.split()[0])
-        T = max(T,pos)
+def get_workers(workers, K):
+    """Returns the number of worker processes to use for reading K files.
 
-    if T == 0:
-        return (numpy.zeros((1,0)), numpy.zeros(0), [])
+    Arguments:
+        workers (int): Requested number of workers. None means data_workers; 0 or
+            less means one per available core.
+        K (int): Number of files to read.
 
-    data = numpy.zeros((K,T))
-    position = numpy.array(range(T)) + 1#numpy.zeros(T)
-    for j,path in enumerate(wig_list):
-        reads = []
-        i = 0
-        for line in open(path):
-            if line[0] not in "0123456789": continue
-            tmp = line.split()
-            pos = int(tmp[0])
-            rd = float(tmp[1])
-            prev_pos = pos
-            data[j,pos-1] = rd
-            i+=1
-    return (data, position)
+    Returns:
+        int: Number of worker processes (1 means the files are read serially).
+    """
+    if workers is None:
+        try:
+            workers = int(data_workers or 1)
+        except ValueError:
+            warnings.warn("Invalid number of workers in TRANSIT_WORKERS: '%s'. Reading files serially." % data_workers)
+            workers = 1
+    if workers <= 0:
+        workers = multiprocessing.cpu_count()
+    return max(1, min(workers, K))
 
+#
 
-def get_data_w_genome(wig_list, genome):
+def get_shared_data(shape, dtype):
+    """Returns a zero-filled matrix in shared memory, for worker processes to fill.
 
-    X = read_genome(genome)
-    N = len(X)
-    positions = []
-    pos2index = {}
-    count = 0
-    for i in range(N-1):
-        if X[i:i+2].upper() == "TA":
-            pos = i+1
-            positions.append(pos)
-            pos2index[pos] = count
-            count +=1
+    Arguments:
+        shape (tuple): Shape (K,T) of the matrix.
+        dtype (numpy.dtype): Type of the matrix.
 
-    positions = numpy.array(positions)
-    T = len(positions)
-    K = len(wig_list)
-    data = numpy.zeros((K,T))
-    for j,path in enumerate(wig_list):
-        for line in open(path):
-            if line[0] not in "0123456789": continue
-            tmp = line.split()
-            pos = int(tmp[0])
-            rd = float(tmp[1])
-            if pos in pos2index:
-                index = pos2index[pos]
-                data[j,index] = rd
-            else:
-                print("Warning: Coordinate %d did not match a TA site in the genome. Ignoring counts." %(pos))
-    return (data, positions)
+    Returns:
+        tuple: The multiprocessing.RawArray holding the matrix, and a numpy view of it.
+    """
+    buffer = multiprocessing.RawArray("b", int(numpy.prod(shape))*dtype.itemsize)
+    return (buffer, numpy.frombuffer(buffer, dtype=dtype).reshape(shape))
 
 #
 
-def combine_replicates(data, method="Sum"):
-    """Returns list of data merged together.
+# State of the worker processes used by the loaders (set by _init_data_worker).
+_worker_state = {}
 
-    Arguments:
-        data (list): List of numeric (replicate) data to be merged.
+def _init_data_worker(buffer, shape, dtype, position):
+    _worker_state["data"] = numpy.frombuffer(buffer, dtype=dtype).reshape(shape)
+    _worker_state["position"] = position
+
+def _read_wig_into_data(task):
+    """Parses one wig file into its row of the shared data matrix.
+
+    Returns 0 on success, 1 if the number of sites differs and 2 if the
+    coordinates differ from the reference ones.
+    """
+    (j, path) = task
+    (pos, reads) = read_wig(path)
+    position = _worker_state["position"]
+    if len(pos) != len(position):
+        return 1
+    if not numpy.array_equal(pos, position):
+        return 2
+    _worker_state["data"][j,:] = reads
+    return 0
+
+def _fill_wig_into_data(task):
+    """Parses one wig file into its row of the shared (zero-filled) data matrix,
+    indexed by coordinate."""
+    (j, path) = task
+    (pos, reads) = read_wig(path)
+    _worker_state["data"][j,pos-1] = reads
+
+def _map_wig_into_data(task):
+    """Parses one wig file into its row of the shared data matrix, indexed by the
+    reference sites. Returns the coordinates that are not sites."""
+    (j, path) = task
+    (pos, reads) = read_wig(path)
+    index = get_site_indexes(_worker_state["position"], pos)
+    found = index >= 0
+    _worker_state["data"][j,index[found]] = reads[found]
+    return pos[~found]
+
+def _read_wig_extent(path):
+    """Returns the last coordinate of a wig file, or 0 if it has no sites."""
+    (pos, reads) = read_wig(path)
+    return int(pos[-1]) if len(pos) > 0 else 0
+
+def _read_wig_nonzero(path):
+    """Returns the last coordinate of a wig file, and the coordinates and
+    read-counts of its sites with insertions."""
+    (pos, reads) = read_wig(path)
+    extent = int(pos[-1]) if len(pos) > 0 else 0
+    if (numpy.diff(pos) <= 0).any():
+        # Keep the last read-count of repeated coordinates, like the dense matrix
+        (pos, last) = numpy.unique(pos[::-1], return_index=True)
+        reads = reads[::-1][last]
+    ii_nz = reads != 0
+    return (extent, pos[ii_nz], reads[ii_nz])
+
+#
+
+def get_data(wig_list, workers=None, dtype=None):
+    """ Returns a tuple of (data, position) containing a matrix of raw read-counts
+        , and list of coordinates.
+
+    With more than one worker, the first file is parsed to get the coordinates
+    and the rest are parsed by a pool of processes, which write their read-counts
+    directly into a matrix in shared memory.
+
+    Arguments:
+        wig_list (list): List of paths to wig files.
+        workers (int): Number of worker processes used to parse the files. Defaults to
+            data_workers (TRANSIT_WORKERS environment variable); 0 means one per core.
+        dtype (str/type): Type of the data matrix. Defaults to data_dtype (TRANSIT_DTYPE
+            environment variable, float64).
+
+    Returns:
+        tuple: Two lists containing data and positions of the wig files given.
+
+    :Example:
+
+        >>> import pytransit.tnseq_tools as tnseq_tools
+        >>> (data, position) = tnseq_tools.get_data(["data/glycerol_H37Rv_rep1.wig", "data/glycerol_H37Rv_rep2.wig"])
+        >>> print(data)
+        array([[ 0.,  0.,  0., ...,  0.,  0.,  0.],
+               [ 0.,  0.,  0., ...,  0.,  0.,  0.]])
+
+    .. seealso:: :class:`get_file_types` :class:`combine_replicates` :class:`get_data_zero_fill` :class:`pytransit.norm_tools.normalize_data`
+    """
+    K = len(wig_list)
+
+    # If empty just quickly return empty lists
+    if not wig_list:
+        return (numpy.zeros((1,0)), numpy.zeros(0), [])
+
+    dtype = get_dtype(dtype)
+    workers = get_workers(workers, K-1)
+    if workers > 1:
+        (position, reads) = read_wig(wig_list[0])
+        T = len(position)
+        (buffer, data) = get_shared_data((K,T), dtype)
+        data[0,:] = reads
+        with multiprocessing.Pool(workers, _init_data_worker, (buffer, (K,T), dtype, position)) as pool:
+            status = pool.map(_read_wig_into_data, list(enumerate(wig_list))[1:])
+        status = [0] + status
+    else:
+        wig_data = [read_wig(path) for path in wig_list]
+        position = wig_data[0][0]
+        T = len(position)
+        status = [0 if numpy.array_equal(pos, position) else (1 if len(pos) != T else 2) for (pos, reads) in wig_data]
+
+    # If the size of the wig files doesn't match, report an error and quit
+    if 1 in status:
+        print("Error: Not all wig files have the same number of sites.")
+        print("       Make sure all .wig files come from the same strain.")
+        sys.exit()
+
+    # Check that the coordinates of all wig files match
+    if 2 in status:
+        j = status.index(2)
+        print("Error: Coordinates in %s do not match those in %s." % (wig_list[j], wig_list[0]))
+        print("       Make sure all .wig files come from the same strain.")
+        sys.exit()
+
+    if workers > 1:
+        return (data, position)
+
+    data = numpy.zeros((K,T), dtype=dtype)
+    for j,(pos, reads) in enumerate(wig_data):
+        data[j,:] = reads
+    return (data, position)
+
+#
+
+def get_data_zero_fill(wig_list, sparse=False, workers=None, dtype=None):
+    """ Returns a tuple of (data, position) containing a matrix of raw read counts,
+        and list of coordinates. Positions that are missing are filled in as zero.
+
+    Arguments:
+        wig_list (list): List of paths to wig files.
+        sparse (bool): Return the data as a scipy.sparse.csc_matrix that only stores
+            the sites with insertions (useful for Tn5 on large genomes).
+        workers (int): Number of worker processes used to parse the files (see get_data).
+        dtype (str/type): Type of the data matrix (see get_data).
+
+    Returns:
+        tuple: Two lists containing data and positions of the wig files given.
+    """
+
+    dtype = get_dtype(dtype)
+    K = len(wig_list)
+    T = 0
+
+    if not wig_list:
+        return (numpy.zeros((1,0)), numpy.zeros(0), [])
+
+    workers = get_workers(workers, K)
+    if sparse:
+        # Only the sites with insertions are kept (and sent back by the workers)
+        if workers > 1:
+            with multiprocessing.Pool(workers) as pool:
+                wig_data = pool.map(_read_wig_nonzero, wig_list)
+        else:
+            wig_data = [_read_wig_nonzero(path) for path in wig_list]
+        T = max(extent for (extent, pos, reads) in wig_data)
+        if T == 0:
+            return (numpy.zeros((1,0)), numpy.zeros(0), [])
+        rows = numpy.concatenate([numpy.full(len(pos), j) for j,(extent, pos, reads) in enumerate(wig_data)])
+        cols = numpy.concatenate([pos-1 for (extent, pos, reads) in wig_data])
+        values = numpy.concatenate([reads for (extent, pos, reads) in wig_data]).astype(dtype)
+        ii_nz = values != 0
+        data = scipy.sparse.csc_matrix((values[ii_nz], (rows[ii_nz], cols[ii_nz])), shape=(K,T), dtype=dtype)
+        return (data, numpy.arange(T) + 1)
+
+    if workers > 1:
+        # The last insertion site over all the replicates determines the size of
+        # the matrix, which the workers then fill in shared memory.
+        with multiprocessing.Pool(workers) as pool:
+            T = max(pool.map(_read_wig_extent, wig_list))
+        if T == 0:
+            return (numpy.zeros((1,0)), numpy.zeros(0), [])
+        (buffer, data) = get_shared_data((K,T), dtype)
+        with multiprocessing.Pool(workers, _init_data_worker, (buffer, (K,T), dtype, None)) as pool:
+            pool.map(_fill_wig_into_data, list(enumerate(wig_list)))
+        return (data, numpy.arange(T) + 1)
+
+    # Each file is read only once; the last insertion site over all the
+    # replicates determines the size of the matrix.
+    wig_data = [read_wig(path) for path in wig_list]
+    for (pos, reads) in wig_data:
+        if len(pos) > 0:
+            T = max(T, int(pos[-1]))
+
+    if T == 0:
+        return (numpy.zeros((1,0)), numpy.zeros(0), [])
+
+    position = numpy.arange(T) + 1
+    data = numpy.zeros((K,T), dtype=dtype)
+    for j,(pos, reads) in enumerate(wig_data):
+        data[j,pos-1] = reads
+    return (data, position)
+
+
+def get_ta_sites(genome, cache=True):
+    """ Returns the sorted coordinates (1-based) of all "TA" dinucleotides in the genome.
+
+    The index is built with a vectorized scan of the sequence, and stored next to
+    the FASTA file (as <genome>.tasites.npz) so repeated runs can load it directly.
+    The stored index is rebuilt if the size or modification time of the FASTA changes.
+
+    Arguments:
+        genome (str): Path to the genome in FASTA format.
+        cache (bool): Whether to read/write the index next to the FASTA file.
+
+    Returns:
+        numpy array: Sorted array with the coordinates of the TA sites.
+    """
+    index_path = genome + ".tasites.npz"
+    signature = numpy.array([get_file_signature(genome)])
+    if cache and os.path.exists(index_path):
+        try:
+            with numpy.load(index_path) as cached:
+                if numpy.array_equal(cached["signature"], signature):
+                    return cached["position"]
+        except Exception as e:
+            warnings.warn("Could not read TA-site index '%s': %s. Rebuilding it." % (index_path, e))
+
+    seq = numpy.frombuffer(read_genome(genome).upper().encode("ascii"), dtype=numpy.uint8)
+    is_ta = (seq[:-1] == ord("T")) & (seq[1:] == ord("A"))
+    position = numpy.flatnonzero(is_ta) + 1
+
+    if cache:
+        try:
+            temp_path = index_path + ".%d.tmp" % os.getpid()
+            with open(temp_path, "wb") as index_file:
+                numpy.savez(index_file, position=position, signature=signature)
+            os.replace(temp_path, index_path)
+        except OSError as e:
+            warnings.warn("Could not write TA-site index '%s': %s" % (index_path, e))
+    return position
+
+#
+
+def get_site_indexes(sites, coords):
+    """ Returns the index of each coordinate in the sorted array of sites.
+
+    Arguments:
+        sites (numpy array): Sorted array with the coordinates of the sites.
+        coords (numpy array): Array of coordinates to look up.
+
+    Returns:
+        numpy array: Array with the index of each coordinate in sites, or -1 if
+            the coordinate is not a site.
+    """
+    coords = numpy.asarray(coords)
+    index = numpy.searchsorted(sites, coords)
+    found = index < len(sites)
+    found[found] = sites[index[found]] == coords[found]
+    index[~found] = -1
+    return index
+
+#
+
+def get_data_w_genome(wig_list, genome, workers=None, dtype=None):
+    """ Returns a tuple of (data, position) containing a matrix of raw read counts,
+        and the coordinates of all TA sites in the genome. TA sites missing from
+        the wig files are filled in as zero.
+
+    Arguments:
+        wig_list (list): List of paths to wig files.
+        genome (str): Path to the genome in FASTA format.
+        workers (int): Number of worker processes used to parse the files (see get_data).
+        dtype (str/type): Type of the data matrix (see get_data).
+
+    Returns:
+        tuple: Two lists containing data and positions of the wig files given.
+    """
+    dtype = get_dtype(dtype)
+    positions = get_ta_sites(genome)
+    T = len(positions)
+    K = len(wig_list)
+    workers = get_workers(workers, K)
+    if workers > 1:
+        (buffer, data) = get_shared_data((K,T), dtype)
+        with multiprocessing.Pool(workers, _init_data_worker, (buffer, (K,T), dtype, positions)) as pool:
+            unmatched = pool.map(_map_wig_into_data, list(enumerate(wig_list)))
+    else:
+        data = numpy.zeros((K,T), dtype=dtype)
+        unmatched = []
+        for j,(pos_list, reads) in enumerate(read_wig(path) for path in wig_list):
+            index = get_site_indexes(positions, pos_list)
+            found = index >= 0
+            data[j,index[found]] = reads[found]
+            unmatched.append(pos_list[~found])
+    for pos_list in unmatched:
+        for pos in pos_list:
+            print("Warning: Coordinate %d did not match a TA site in the genome. Ignoring counts." %(pos))
+    return (data, positions)
+
+#
+
+def get_file_signature(path):
+    """Returns a string identifying the current state of a file on disk.
+
+    Arguments:
+        path (str): Path to the file.
+
+    Returns:
+        str: String with the absolute path, size and modification time of the file.
+    """
+    st = os.stat(path)
+    return "%s:%d:%d" % (os.path.abspath(path), st.st_size, st.st_mtime_ns)
+
+#
+
+def get_data_cache_path(wig_list, loader="plain", genome="", cache_dir="", dtype=None):
+    """Returns the path of the cache file for the given wig files and loader.
+
+    Arguments:
+        wig_list (list): List of paths to wig files.
+        loader (str): Loader variant ("plain", "zero_fill" or "genome").
+        genome (str): Path to the genome in FASTA format (for the "genome" loader).
+        cache_dir (str): Directory holding the cache files.
+        dtype (str/type): Type of the data matrix (see get_data).
+
+    Returns:
+        str: Path to the .npz cache file.
+    """
+    paths = [os.path.abspath(path) for path in wig_list]
+    if genome: paths.append(os.path.abspath(genome))
+    key = hashlib.sha1("\n".join([loader, get_dtype(dtype).name] + paths).encode("utf-8")).hexdigest()
+    return os.path.join(cache_dir, "%s_%s.npz" % (loader, key))
+
+#
+
+def get_cached_data(wig_list, loader="plain", genome="", cache_dir=None, sparse=False, dtype=None):
+    """ Returns a tuple of (data, position) like get_data, get_data_zero_fill or
+        get_data_w_genome, using an on-disk cache of the loaded matrices.
+
+    The cache is only used if a cache directory is given, or set through
+    data_cache_dir (TRANSIT_CACHE_DIR environment variable). Entries are keyed
+    by loader and file paths, and are rebuilt if the size or modification time
+    of any of the files changed. A single TnSeq dataset bundle (see
+    write_dataset_bundle) is loaded directly, memory-mapped.
+
+    Arguments:
+        wig_list (list): List of paths to wig files.
+        loader (str): Loader variant ("plain", "zero_fill" or "genome").
+        genome (str): Path to the genome in FASTA format (for the "genome" loader).
+        cache_dir (str): Directory holding the cache files. Defaults to data_cache_dir.
+        sparse (bool): Return sparse data for the "zero_fill" loader (see get_data_zero_fill).
+        dtype (str/type): Type of the data matrix (see get_data).
+
+    Returns:
+        tuple: Two lists containing data and positions of the wig files given.
+
+    .. seealso:: :class:`get_data` :class:`get_data_zero_fill` :class:`get_data_w_genome`
+    """
+    dtype = get_dtype(dtype)
+    if len(wig_list) == 1 and is_dataset_bundle(wig_list[0]):
+        bundle = read_dataset_bundle(wig_list[0])
+        data = bundle["data"] if bundle["data"].dtype == dtype else bundle["data"].astype(dtype)
+        if sparse: data = scipy.sparse.csc_matrix(data)
+        return (data, bundle["position"])
+
+    if loader == "genome":
+        load = lambda wigs: get_data_w_genome(wigs, genome, dtype=dtype)
+    elif loader == "zero_fill":
+        load = lambda wigs: get_data_zero_fill(wigs, sparse=sparse, dtype=dtype)
+        if sparse: loader = "zero_fill_sparse"
+    else:
+        load = lambda wigs: get_data(wigs, dtype=dtype)
+
+    if cache_dir is None:
+        cache_dir = data_cache_dir
+    if not cache_dir or not wig_list:
+        return load(wig_list)
+
+    signature = numpy.array([get_file_signature(path) for path in wig_list + ([genome] if genome else [])])
+    cache_path = get_data_cache_path(wig_list, loader, genome, cache_dir, dtype)
+    if os.path.exists(cache_path):
+        try:
+            with numpy.load(cache_path) as cached:
+                if numpy.array_equal(cached["signature"], signature):
+                    if "indptr" in cached:
+                        data = scipy.sparse.csc_matrix((cached["data"], cached["indices"], cached["indptr"]), shape=tuple(cached["shape"]))
+                        return (data, cached["position"])
+                    return (cached["data"], cached["position"])
+        except Exception as e:
+            warnings.warn("Could not read cached data '%s': %s. Rebuilding it." % (cache_path, e))
+
+    (data, position) = load(wig_list)
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        temp_path = cache_path + ".%d.tmp" % os.getpid()
+        with open(temp_path, "wb") as cache_file:
+            if scipy.sparse.issparse(data):
+                numpy.savez(cache_file, data=data.data, indices=data.indices, indptr=data.indptr, shape=data.shape, position=position, signature=signature)
+            else:
+                numpy.savez(cache_file, data=data, position=position, signature=signature)
+        os.replace(temp_path, cache_path)
+    except OSError as e:
+        warnings.warn("Could not write cached data '%s': %s" % (cache_path, e))
+    return (data, position)
+
+#
+
+def is_dataset_bundle(path):
+    """Returns True if the path is a TnSeq dataset bundle (see write_dataset_bundle).
+
+    Arguments:
+        path (str): Path to the file.
+
+    Returns:
+        bool: True if the file starts with the bundle magic bytes.
+    """
+    if not isinstance(path, str) or not os.path.isfile(path):
+        return False
+    with open(path, "rb") as f:
+        return f.read(len(BUNDLE_MAGIC)) == BUNDLE_MAGIC
+
+#
+
+def is_genes_snapshot(path):
+    """Returns True if the path is a snapshot of a Genes object (see Genes.save).
+
+    Arguments:
+        path (str): Path to the file.
+
+    Returns:
+        bool: True if the file starts with the snapshot magic bytes.
+    """
+    if not isinstance(path, str) or not os.path.isfile(path):
+        return False
+    with open(path, "rb") as f:
+        return f.read(len(GENES_MAGIC)) == GENES_MAGIC
+
+#
+
+def write_binary_arrays(path, magic, header, arrays):
+    """Writes a JSON header and a set of numpy arrays to a single binary file.
+
+    The file starts with the magic bytes, the length of the JSON header (little-endian
+    uint64) and the header itself. The arrays follow, each aligned to BUNDLE_ALIGNMENT
+    bytes at the offset recorded in the "arrays" field of the header, so they can be
+    memory-mapped (see read_binary_arrays).
+
+    Arguments:
+        path (str): Path to the output file, or a file object opened in binary mode.
+        magic (bytes): Bytes identifying the type of file.
+        header (dict): Header fields (must be serializable to JSON).
+        arrays (dict): Dictionary of name to numpy array.
+    """
+    def encode_header():
+        return json.dumps(header).encode("utf-8")
+
+    # The array offsets depend on the header size, which depends on the offsets;
+    # iterate until the layout is stable.
+    header["arrays"] = {}
+    while True:
+        offset = len(magic) + 8 + len(encode_header())
+        layout = {}
+        for name in sorted(arrays):
+            offset += -offset % BUNDLE_ALIGNMENT
+            layout[name] = {"dtype": arrays[name].dtype.str, "shape": list(arrays[name].shape), "offset": offset}
+            offset += arrays[name].nbytes
+        if layout == header["arrays"]: break
+        header["arrays"] = layout
+
+    encoded = encode_header()
+    f = open(path, "wb") if isinstance(path, str) else path
+    with f:
+        f.write(magic)
+        f.write(struct.pack("<Q", len(encoded)))
+        f.write(encoded)
+        written = len(magic) + 8 + len(encoded)
+        for name in sorted(arrays):
+            f.write(b"\0" * (layout[name]["offset"] - written))
+            f.write(numpy.ascontiguousarray(arrays[name]).tobytes())
+            written = layout[name]["offset"] + arrays[name].nbytes
+
+#
+
+def read_binary_arrays(path, magic, version, mmap=True):
+    """Reads a file written by write_binary_arrays.
+
+    Arguments:
+        path (str): Path to the file.
+        magic (bytes): Expected bytes identifying the type of file.
+        version (int): Latest version of the format that can be read.
+        mmap (bool): Memory-map the arrays (copy-on-write) instead of reading them.
+
+    Returns:
+        dict: Dictionary with the header fields and the arrays.
+    """
+    with open(path, "rb") as f:
+        if f.read(len(magic)) != magic:
+            raise ValueError("'%s' is not a %s file." % (path, magic.decode("ascii").strip("\0")))
+        (length,) = struct.unpack("<Q", f.read(8))
+        header = json.loads(f.read(length).decode("utf-8"))
+        if header.get("version", 0) > version:
+            raise ValueError("'%s' was written by a newer version of TRANSIT." % path)
+        for (name, layout) in header.pop("arrays").items():
+            shape = tuple(layout["shape"])
+            dtype = numpy.dtype(layout["dtype"])
+            if mmap and numpy.prod(shape) > 0:
+                header[name] = numpy.memmap(path, dtype=dtype, mode="c", offset=layout["offset"], shape=shape)
+            else:
+                f.seek(layout["offset"])
+                header[name] = numpy.fromfile(f, dtype=dtype, count=int(numpy.prod(shape))).reshape(shape)
+    return header
+
+#
+
+def write_dataset_bundle(path, data, position, files, annotation="", metadata="", transposon="himar1"):
+    """Writes a TnSeq dataset bundle: a single binary file with the read-counts,
+    coordinates and labels of the datasets, their samples metadata, and an index
+    of the genes of the annotation covering each site.
+
+    The file starts with BUNDLE_MAGIC, the length of a JSON header (little-endian
+    uint64) and the header itself. The arrays follow, each aligned to BUNDLE_ALIGNMENT
+    bytes at the offset recorded in the header, so they can be memory-mapped.
+
+    Arguments:
+        path (str): Path to the output file, or a file object opened in binary mode.
+        data (numpy array): (K,N) numpy array of read-counts at N sites for K datasets.
+        position (numpy array): Coordinates of the N sites.
+        files (list): Labels (file names) of the K datasets.
+        annotation (str): Path to the annotation (.prot_table or GFF3). Optional.
+        metadata (str): Path to the samples metadata file. Optional.
+        transposon (str): Transposon type of the datasets ("himar1" or "tn5").
+
+    .. seealso:: :class:`read_dataset_bundle`
+    """
+    if scipy.sparse.issparse(data):
+        data = data.toarray()
+    arrays = {"data": numpy.asarray(data), "position": numpy.asarray(position, dtype=numpy.int64)}
+    header = {"version": BUNDLE_VERSION, "files": list(files), "transposon": transposon,
+              "annotation": os.path.basename(annotation), "metadata": "", "conditions": [],
+              "gene_ids": [], "gene_info": {}}
+
+    if metadata:
+        with open_file(metadata) as f:
+            header["metadata"] = f.read()
+        conditionsByFile = read_samples_metadata(metadata)[0]
+        header["conditions"] = [conditionsByFile.get(name, "") for name in files]
+
+    if annotation:
+        orf2info = get_gene_info(annotation)
+        hash = get_pos_hash(annotation)
+        if isinstance(hash, PosHash):
+            hash = hash.for_positions(arrays["position"])
+        header["gene_ids"] = get_gene_ids(annotation)
+        header["gene_info"] = dict([(orf, list(info)) for (orf, info) in orf2info.items()])
+        orfs = list(dict.fromkeys(header["gene_ids"] + list(orf2info)))
+        orf2id = dict([(orf, i) for (i, orf) in enumerate(orfs)])
+        site_genes = [[orf2id.setdefault(orf, len(orf2id)) for orf in hash.get(pos, [])] for pos in arrays["position"]]
+        header["orfs"] = sorted(orf2id, key=orf2id.get)
+        arrays["site_gene_indptr"] = numpy.cumsum([0] + [len(ids) for ids in site_genes], dtype=numpy.int64)
+        arrays["site_gene_indices"] = numpy.array([i for ids in site_genes for i in ids], dtype=numpy.int32)
+
+    write_binary_arrays(path, BUNDLE_MAGIC, header, arrays)
+
+#
+
+def read_dataset_bundle(path, mmap=True):
+    """Returns the contents of a TnSeq dataset bundle (see write_dataset_bundle).
+
+    Arguments:
+        path (str): Path to the bundle.
+        mmap (bool): Memory-map the arrays (copy-on-write) instead of reading them.
+
+    Returns:
+        dict: Dictionary with the arrays ("data", "position" and, if an annotation was
+            included, "site_gene_indptr" and "site_gene_indices") and the header fields
+            ("files", "conditions", "metadata", "transposon", "annotation", "gene_ids",
+            "gene_info" and "orfs").
+
+    :Example:
+
+        >>> import pytransit.tnseq_tools as tnseq_tools
+        >>> bundle = tnseq_tools.read_dataset_bundle("glycerol.tnbundle")
+        >>> print(bundle["data"].shape)
+        (2, 74605)
+    """
+    header = read_binary_arrays(path, BUNDLE_MAGIC, BUNDLE_VERSION, mmap)
+    header["gene_info"] = dict([(orf, tuple(info)) for (orf, info) in header.get("gene_info", {}).items()])
+    return header
+
+#
+
+def get_bundle_pos_hash(bundle):
+    """Returns a dictionary that maps the coordinates of the sites of a bundle to the
+    list of genes that occur at that coordinate (see get_pos_hash).
+
+    Arguments:
+        bundle (dict): Bundle returned by read_dataset_bundle.
+
+    Returns:
+        dict: Dictionary of position to list of genes that share that position.
+    """
+    hash = {}
+    if "site_gene_indptr" not in bundle:
+        return hash
+    orfs = bundle["orfs"]
+    indptr = bundle["site_gene_indptr"]
+    indices = bundle["site_gene_indices"]
+    for i in numpy.flatnonzero(numpy.diff(indptr)):
+        hash[int(bundle["position"][i])] = [orfs[j] for j in indices[indptr[i]:indptr[i+1]]]
+    return hash
+
+#
+
+def combine_replicates(data, method="Sum"):
+    """Returns list of data merged together.
+
+    Arguments:
+        data (list): List of numeric (replicate) data to be merged. May be a
+            scipy.sparse matrix.
         method (str): How to combine the replicate dataset.
 
     Returns:
         list: List of numeric dataset now merged together.
     """
 
+    if scipy.sparse.issparse(data):
+        K = data.shape[0]
+        if method == "Sum":
+            combined = numpy.round(numpy.asarray(data.sum(0)).ravel())
+        elif method == "Mean":
+            combined = numpy.round(numpy.asarray(data.sum(0)).ravel()/float(K))
+        elif method == "TTRMean":
+            (data, factors) = norm_tools.normalize_data(data, "TTR")
+            target_factors = norm_tools.norm_to_target(data, 100)
+            data = norm_tools.scale_data(data, target_factors)
+            combined = numpy.round(numpy.asarray(data.sum(0)).ravel()/float(K))
+        else:
+            combined = data[0,:].toarray().ravel()
+        return combined
+
     if method == "Sum":
         combined = numpy.round(numpy.sum(data,0))
     elif method == "Mean":
@@ -1090,116 +2160,519 @@ def get_wig_stats(path):
 #
 
 def get_extended_pos_hash_pt(path, N=None):
-    #TODO: Write docstring
+    """Returns a dictionary that maps coordinates to the previous, current and next genes.
 
-    hash = {}
-    maxcoord = float("-inf")
-    data = []
-    for line in open(path):
-        if line.startswith("#"): continue
-        tmp = line.split("\t")
-        orf = tmp[8]
-        start = int(tmp[1])
-        end = int(tmp[2])
-        maxcoord = max(maxcoord, start, end)
-        data.append((orf, start, end))
+    Arguments:
+        path (str): Path to annotation in .prot_table format.
+        N (int): Optional genome length (see GeneNeighborIndex).
 
-    genome_start = 1
-    if N:
-        genome_end = maxcoord
-    else:
-        genome_end = N
+    Returns:
+        ExtendedPosHash: Dictionary-like object of position to a dictionary with the
+            lists of "prev", "current" and "next" genes.
+    """
+    index = get_annotation_index(path)
+    return ExtendedPosHash(GeneNeighborIndex(index.orfs, index.starts, index.ends, N=N))
 
-    for i,(orf, start, end) in enumerate(data):
-        if genome_start > start:
-            genome_start = start
+def get_extended_pos_hash_gff(path, N=None):
+    """Returns a dictionary that maps coordinates to the previous, current and next genes.
 
-        prev_orf = ""
-        if i > 0:
-            prev_orf = data[i-1][0]
+    Arguments:
+        path (str): Path to annotation in GFF3 format.
+        N (int): Optional genome length (see GeneNeighborIndex).
 
-        next_orf = ""
-        if i < len(data)-1:
-            next_orf = data[i+1][0]
+    Returns:
+        ExtendedPosHash: Dictionary-like object of position to a dictionary with the
+            lists of "prev", "current" and "next" genes.
+    """
+    index = get_annotation_index(path)
+    return ExtendedPosHash(GeneNeighborIndex(index.orfs, index.starts, index.ends, N=N))
 
-        for pos in range(genome_start, end+1):
-            if pos not in hash: hash[pos] = {"current":[], "prev":[], "next":[]}
+#
 
-            hash[pos]["prev"].append(prev_orf)
+class AnnotationIndex:
+    """Interval index of the genes (features) of an annotation.
 
-            if pos >= start:
-                hash[pos]["next"].append(next_orf)
-                hash[pos]["current"].append(orf)
-            else:
-                hash[pos]["next"].append(orf)
-        genome_start = end+1
+    Answers which genes overlap a coordinate, a list of coordinates or a range,
+    using the start coordinates of the genes sorted for binary search instead of
+    a dictionary with an entry per nucleotide. Genes are reported in the order of
+    the annotation.
 
-    if N:
-        for pos in range(maxcoord, genome_end+1):
-            if pos not in hash: hash[pos] = {"current":[], "prev":[], "next":[]}
-            hash[pos]["prev"].append(prev_orf)
-    return hash
+    Attributes:
+        orfs: List with the id of each gene, in the order of the annotation.
+        starts: Numpy array with the start coordinate of each gene.
+        ends: Numpy array with the end coordinate of each gene.
+        strands: Numpy array with the strand of each gene.
+        info: List with the tuple of information of each gene (see get_gene_info).
+    """
 
-def get_extended_pos_hash_gff(path, N=None):
-    #TODO: Write docstring
+    # Genes longer than this many times the median length (e.g. a GFF "region"
+    # spanning the genome) are checked separately, so they don't widen the search.
+    LONG_FACTOR = 20
 
-    hash = {}
-    maxcoord = float("-inf")
-    data = []
-    for line in open(path):
+    def __init__(self, orfs, starts, ends, info=None):
+        """Initializes the index from the ids and coordinates of the genes.
+
+        Arguments:
+            orfs (list): List of gene ids.
+            starts (list): List of start coordinates.
+            ends (list): List of end coordinates (inclusive).
+            info (list): Optional list of (name, description, start, end, strand) tuples.
+        """
+        self.orfs = list(orfs)
+        self.info = list(info) if info is not None else [("", "", s, e, "+") for (s, e) in zip(starts, ends)]
+        self.starts = numpy.array(starts, dtype=numpy.int64)
+        self.ends = numpy.array(ends, dtype=numpy.int64)
+        self.strands = numpy.array([i[4] for i in self.info], dtype=str)
+
+        lengths = self.ends - self.starts
+        valid = numpy.flatnonzero(lengths >= 0)
+        limit = self.LONG_FACTOR * max(1, int(numpy.median(lengths[valid]))) if len(valid) else 0
+        self.long_genes = valid[lengths[valid] > limit]
+        short_genes = valid[lengths[valid] <= limit]
+        self.order = short_genes[numpy.argsort(self.starts[short_genes], kind="stable")]
+        self.sorted_starts = self.starts[self.order]
+        self.max_length = int(lengths[short_genes].max()) if len(short_genes) else 0
+        # Python lists for fast scalar lookups
+        self._sorted_starts_list = self.sorted_starts.tolist()
+        self._order_list = self.order.tolist()
+        self._long_list = self.long_genes.tolist()
+        self._starts_list = self.starts.tolist()
+        self._ends_list = self.ends.tolist()
+
+#
+
+    @classmethod
+    def from_annotation(self, path):
+        """Returns the index of the genes of an annotation (see get_annotation_index)."""
+        return get_annotation_index(path)
+
+#
+
+    def __len__(self):
+        """Returns the number of genes in the index."""
+        return len(self.orfs)
+
+#
+
+    def get_gene_info(self):
+        """Returns a dictionary that maps gene id to gene information (see get_gene_info)."""
+        return dict(zip(self.orfs, self.info))
+
+#
+
+    def genes_at(self, pos):
+        """Returns the list of genes that overlap the given coordinate.
+
+        Arguments:
+            pos (int): Coordinate.
+
+        Returns:
+            list: List of gene ids, in the order of the annotation.
+        """
+        lo = bisect.bisect_left(self._sorted_starts_list, pos - self.max_length)
+        hi = bisect.bisect_right(self._sorted_starts_list, pos)
+        ends = self._ends_list
+        found = [g for g in self._order_list[lo:hi] if ends[g] >= pos]
+        found += [g for g in self._long_list if self._starts_list[g] <= pos <= ends[g]]
+        if len(found) > 1: found.sort()
+        return [self.orfs[g] for g in found]
+
+#
+
+    def genes_at_positions(self, positions):
+        """Returns the genes that overlap each of the given coordinates, in bulk.
+
+        Arguments:
+            positions (list): List (or numpy array) of coordinates.
+
+        Returns:
+            tuple: Numpy arrays (indptr, indices) in CSR layout: the genes overlapping
+                positions[i] are indices[indptr[i]:indptr[i+1]], as indexes of orfs.
+        """
+        positions = numpy.asarray(positions, dtype=numpy.int64)
+        lo = numpy.searchsorted(self.sorted_starts, positions - self.max_length, side="left")
+        hi = numpy.searchsorted(self.sorted_starts, positions, side="right")
+        counts = hi - lo
+        site = numpy.repeat(numpy.arange(len(positions)), counts)
+        offset = numpy.arange(len(site)) - numpy.repeat(numpy.cumsum(counts) - counts, counts)
+        gene = self.order[lo[site] + offset] if len(site) else numpy.zeros(0, dtype=numpy.int64)
+        keep = self.ends[gene] >= positions[site]
+        site, gene = site[keep], gene[keep]
+
+        for g in self.long_genes:
+            covered = numpy.flatnonzero((positions >= self.starts[g]) & (positions <= self.ends[g]))
+            site = numpy.concatenate([site, covered])
+            gene = numpy.concatenate([gene, numpy.full(len(covered), g)])
+
+        ii = numpy.lexsort((gene, site))
+        indptr = numpy.zeros(len(positions)+1, dtype=numpy.int64)
+        numpy.cumsum(numpy.bincount(site, minlength=len(positions)), out=indptr[1:])
+        return (indptr, gene[ii])
+
+#
+
+    def genes_in_range(self, start, end):
+        """Returns the list of genes that overlap the range of coordinates [start, end].
+
+        Arguments:
+            start (int): Start coordinate of the range.
+            end (int): End coordinate of the range.
+
+        Returns:
+            list: Sorted list of the (unique) gene ids.
+        """
+        valid = self.ends >= self.starts
+        overlap = numpy.flatnonzero(valid & (self.starts <= end) & (self.ends >= start))
+        return sorted(set([self.orfs[g] for g in overlap]))
+
+#
+
+class PosHash:
+    """Read-only dictionary-like view of an AnnotationIndex, mapping coordinates to
+    the list of genes that occur at that coordinate.
+
+    Provides the interface of the dictionaries formerly returned by get_pos_hash
+    (get, [], in, iteration over the covered coordinates), without storing an entry
+    per nucleotide.
+
+    Attributes:
+        index: AnnotationIndex with the genes.
+    """
+
+    def __init__(self, index):
+        self.index = index
+
+    def get(self, pos, default=None):
+        genes = self.index.genes_at(pos)
+        return genes if genes else default
+
+    def __getitem__(self, pos):
+        genes = self.index.genes_at(pos)
+        if not genes: raise KeyError(pos)
+        return genes
+
+    def __contains__(self, pos):
+        return bool(self.index.genes_at(pos))
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def __len__(self):
+        return len(self.keys())
+
+    def keys(self):
+        """Returns the coordinates covered by at least one gene, sorted."""
+        valid = self.index.ends >= self.index.starts
+        if not numpy.any(valid):
+            return []
+        covered = numpy.concatenate([numpy.arange(s, e+1) for (s, e) in zip(self.index.starts[valid], self.index.ends[valid])])
+        return numpy.unique(covered).tolist()
+
+    def items(self):
+        return [(pos, self[pos]) for pos in self.keys()]
+
+    def for_positions(self, positions):
+        """Returns a dictionary of the given coordinates to the list of genes that
+        occur at that coordinate (only coordinates covered by genes are included).
+
+        Arguments:
+            positions (list): List (or numpy array) of coordinates.
+
+        Returns:
+            dict: Dictionary of position to list of genes.
+        """
+        (indptr, indices) = self.index.genes_at_positions(positions)
+        orfs = self.index.orfs
+        return dict([(int(positions[i]), [orfs[g] for g in indices[indptr[i]:indptr[i+1]]]) for i in numpy.flatnonzero(numpy.diff(indptr))])
+
+#
+
+class GeneNeighborIndex:
+    """Index of the previous, current and next genes of each coordinate.
+
+    Genes are taken in the order of the annotation. Gene i covers the coordinates
+    from the end of the previous gene (or its own start, if they overlap) to its own
+    end. At those coordinates the previous gene is gene i-1, and inside the gene
+    the current gene is i and the next gene is i+1; before its start (intergenic
+    region) there is no current gene and the next gene is i. Coordinates covered by
+    several genes have one entry per gene.
+
+    The index only stores arrays with one value per gene, and coordinates are looked
+    up with binary search (see AnnotationIndex).
+
+    Attributes:
+        orfs: List with the id of each gene, in the order of the annotation.
+        starts: Numpy array with the start coordinate of each gene.
+        ends: Numpy array with the end coordinate of each gene.
+        index: AnnotationIndex of the range of coordinates covered by each gene.
+    """
+
+    def __init__(self, orfs, starts, ends, N=None):
+        """Initializes the index from the ids and coordinates of the genes.
+
+        Arguments:
+            orfs (list): List of gene ids.
+            starts (list): List of start coordinates.
+            ends (list): List of end coordinates (inclusive).
+            N (int): Optional genome length. If given, the last coordinate of the
+                annotation also gets the previous gene of the last gene.
+        """
+        self.orfs = list(orfs)
+        self.starts = numpy.array(starts, dtype=numpy.int64)
+        self.ends = numpy.array(ends, dtype=numpy.int64)
+        range_starts = numpy.minimum(numpy.concatenate([[1], self.ends[:-1] + 1]), self.starts)
+        self.index = AnnotationIndex(self.orfs, range_starts, self.ends)
+
+        self.tail = None
+        if N and self.orfs:
+            maxcoord = int(max(self.starts.max(), self.ends.max()))
+            self.tail = (maxcoord, len(self.orfs)-2)
+
+#
+
+    def neighbors_at_positions(self, positions):
+        """Returns the previous, current and next genes of each of the given coordinates.
+
+        Arguments:
+            positions (list): List (or numpy array) of coordinates.
+
+        Returns:
+            tuple: Numpy arrays (indptr, prev, current, next). The entries of positions[i]
+                are prev[indptr[i]:indptr[i+1]] (and likewise for current and next),
+                as indexes of orfs, or -1 if there is no such gene.
+        """
+        positions = numpy.asarray(positions, dtype=numpy.int64)
+        (indptr, genes) = self.index.genes_at_positions(positions)
+        site = numpy.repeat(numpy.arange(len(positions)), numpy.diff(indptr))
+        inside = positions[site] >= self.starts[genes]
+        G = len(self.orfs)
+        prev = genes - 1
+        current = numpy.where(inside, genes, -1)
+        next = numpy.where(inside, numpy.where(genes + 1 < G, genes + 1, -1), genes)
+        return (indptr, prev, current, next)
+
+#
+
+    def get(self, pos):
+        """Returns the previous, current and next genes of a coordinate.
+
+        Arguments:
+            pos (int): Coordinate.
+
+        Returns:
+            dict: Dictionary with the lists of "prev", "current" and "next" gene ids
+                ("" if there is no previous/next gene), or None if the coordinate is
+                not covered by any gene.
+        """
+        (indptr, prev, current, next) = self.neighbors_at_positions([pos])
+        orf = lambda i: self.orfs[i] if i >= 0 else ""
+        result = None
+        if len(prev):
+            result = {"current": [orf(i) for i in current if i >= 0],
+                      "prev": [orf(i) for i in prev],
+                      "next": [orf(i) for i in next]}
+        if self.tail and pos == self.tail[0]:
+            if result is None: result = {"current": [], "prev": [], "next": []}
+            result["prev"].append(orf(self.tail[1]))
+        return result
+
+#
+
+class ExtendedPosHash:
+    """Read-only dictionary-like view of a GeneNeighborIndex, mapping coordinates to a
+    dictionary with the lists of "prev", "current" and "next" genes.
+
+    Provides the interface of the dictionaries formerly returned by
+    get_extended_pos_hash (get, [], in) without storing an entry per nucleotide.
+
+    Attributes:
+        index: GeneNeighborIndex with the genes.
+    """
+
+    def __init__(self, index):
+        self.index = index
+
+    def get(self, pos, default=None):
+        result = self.index.get(pos)
+        return result if result is not None else default
+
+    def __getitem__(self, pos):
+        result = self.index.get(pos)
+        if result is None: raise KeyError(pos)
+        return result
+
+    def __contains__(self, pos):
+        return self.index.get(pos) is not None
+
+#
+
+def get_gene_intervals_pt(path):
+    """Returns the ids, coordinates and information of the genes of a .prot_table,
+    in file order.
+
+    Arguments:
+        path (str): Path to annotation in .prot_table format.
+
+    Returns:
+        tuple: Lists with the gene ids, start coordinates, end coordinates and the
+            tuples of gene information (see get_gene_info). Strings are interned.
+    """
+    orfs, starts, ends, info = [], [], [], []
+    for line in open_file(path):
         if line.startswith("#"): continue
         tmp = line.strip().split("\t")
-        features = dict([tuple(f.split("=")) for f in tmp[8].split(";")])
+        orfs.append(sys.intern(tmp[8]))
+        starts.append(int(tmp[1]))
+        ends.append(int(tmp[2]))
+        info.append((sys.intern(tmp[7]), sys.intern(tmp[0]), int(tmp[1]), int(tmp[2]), sys.intern(tmp[3])))
+    return (orfs, starts, ends, info)
+
+#
+
+def get_gene_intervals_gff(path):
+    """Returns the ids, coordinates and information of the features (with an ID) of
+    a GFF3 file, in file order.
+
+    Arguments:
+        path (str): Path to annotation in GFF3 format.
+
+    Returns:
+        tuple: Lists with the feature ids, start coordinates, end coordinates and the
+            tuples of gene information (see get_gene_info). Strings are interned.
+    """
+    orfs, starts, ends, info = [], [], [], []
+    for line in open_file(path):
+        if line.startswith("#"): continue
+        tmp = line.strip().split("\t")
+        features = dict([tuple(f.split("=",1)) for f in filter(lambda x: "=" in x, tmp[8].split(";"))])
         if "ID" not in features: continue
-        orf = features["ID"]
-        chr = tmp[0]
-        type = tmp[2]
-        start = int(tmp[3])
-        end = int(tmp[4])
-        maxcoord = max(maxcoord, start, end)
-        data.append((orf,start,end))
+        name = features.get("Name", "-")
+        if name == "-": name = features.get("name", "-")
+        desc = "-"
+        for field in ["Description", "description", "Desc", "desc", "product"]:
+            if desc == "-": desc = features.get(field, "-")
+        orfs.append(sys.intern(features["ID"]))
+        starts.append(int(tmp[3]))
+        ends.append(int(tmp[4]))
+        info.append((sys.intern(name), sys.intern(desc), int(tmp[3]), int(tmp[4]), sys.intern(tmp[6])))
+    return (orfs, starts, ends, info)
 
-    genome_start = 1
-    if N:
-        genome_end = maxcoord
-    else:
-        genome_end = N
+#
 
-    for i,(orf, start, end) in enumerate(data):
+# Memoized annotation indexes, keyed by path (and invalidated by size/mtime).
+_annotation_index_cache = {}
 
-        if genome_start > start:
-            genome_start = start
+def get_annotation_index(path, cache=None):
+    """Returns the interval index of the genes of an annotation.
 
-        prev_orf = ""
-        if i > 0:
-            prev_orf = data[i-1][0]
+    The annotation is parsed once and shared by all the functions that need it
+    (get_gene_info, get_pos_hash, read_genes, Genes, ...). Indexes are memoized for
+    the process, and can also be stored next to the annotation (as
+    <annotation>.annotation.npz) so later runs skip parsing the text. Both are
+    rebuilt if the size or modification time of the annotation changes.
 
-        next_orf = ""
-        if i < len(data)-1:
-            next_orf = data[i+1][0]
+    Arguments:
+        path (str): Path to annotation in .prot_table or GFF3 format, or a TnSeq
+            dataset bundle that includes an annotation.
+        cache (bool): Whether to read/write the parsed annotation next to the file.
+            Defaults to the TRANSIT_ANNOTATION_CACHE setting.
 
-        for pos in range(genome_start, end+1):
-            if pos not in hash: hash[pos] = {"current":[], "prev":[], "next":[]}
+    Returns:
+        AnnotationIndex: Index of the genes of the annotation.
 
-            hash[pos]["prev"].append(prev_orf)
+    :Example:
 
-            if pos >= start:
-                hash[pos]["next"].append(next_orf)
-                hash[pos]["current"].append(orf)
+        >>> import pytransit.tnseq_tools as tnseq_tools
+        >>> index = tnseq_tools.get_annotation_index("transit/genomes/H37Rv.prot_table")
+        >>> print(index.genes_at(3000))
+        ['Rv0002']
+    """
+    if cache is None: cache = annotation_cache
+    key = os.path.abspath(path)
+    st = os.stat(path)
+    signature = (st.st_size, st.st_mtime_ns)
+    if key in _annotation_index_cache and _annotation_index_cache[key][0] == signature:
+        return _annotation_index_cache[key][1]
+
+    if is_dataset_bundle(path):
+        bundle = read_dataset_bundle(path)
+        info = [bundle["gene_info"][orf] for orf in bundle["gene_ids"]]
+        index = AnnotationIndex(bundle["gene_ids"], [i[2] for i in info], [i[3] for i in info], info)
+    else:
+        sidecar_path = path + ".annotation.npz"
+        sidecar_signature = numpy.array([get_file_signature(path)])
+        intervals = None
+        if cache and os.path.exists(sidecar_path):
+            try:
+                intervals = read_annotation_sidecar(sidecar_path, sidecar_signature)
+            except Exception as e:
+                warnings.warn("Could not read parsed annotation '%s': %s. Rebuilding it." % (sidecar_path, e))
+
+        if intervals is None:
+            if get_file_extension(path) in [".gff", ".gff3"]:
+                intervals = get_gene_intervals_gff(path)
             else:
-                hash[pos]["next"].append(orf)
-        genome_start = end+1
+                intervals = get_gene_intervals_pt(path)
+            if cache:
+                try:
+                    write_annotation_sidecar(sidecar_path, sidecar_signature, *intervals)
+                except OSError as e:
+                    warnings.warn("Could not write parsed annotation '%s': %s" % (sidecar_path, e))
+        index = AnnotationIndex(*intervals)
+    _annotation_index_cache[key] = (signature, index)
+    return index
 
-    if N:
-        for pos in range(maxcoord, genome_end+1):
-            if pos not in hash: hash[pos] = {"current":[], "prev":[], "next":[]}
-            hash[pos]["prev"].append(prev_orf)
-    return hash
+#
+
+def write_annotation_sidecar(path, signature, orfs, starts, ends, info):
+    """Writes a parsed annotation (see get_gene_intervals_pt) in binary format.
 
+    Arguments:
+        path (str): Path to the output (.npz) file.
+        signature (numpy array): Signature of the annotation file (see get_file_signature).
+        orfs (list): List of gene ids.
+        starts (list): List of start coordinates.
+        ends (list): List of end coordinates.
+        info (list): List of (name, description, start, end, strand) tuples.
+    """
+    temp_path = path + ".%d.tmp" % os.getpid()
+    with open(temp_path, "wb") as sidecar_file:
+        numpy.savez(sidecar_file, signature=signature,
+                orfs=numpy.array(orfs, dtype=str),
+                starts=numpy.array(starts, dtype=numpy.int64),
+                ends=numpy.array(ends, dtype=numpy.int64),
+                names=numpy.array([i[0] for i in info], dtype=str),
+                descs=numpy.array([i[1] for i in info], dtype=str),
+                strands=numpy.array([i[4] for i in info], dtype=str))
+    os.replace(temp_path, path)
 
+#
 
+def read_annotation_sidecar(path, signature):
+    """Reads a parsed annotation written by write_annotation_sidecar.
 
+    Arguments:
+        path (str): Path to the (.npz) file.
+        signature (numpy array): Expected signature of the annotation file.
+
+    Returns:
+        tuple: Lists with the gene ids, start coordinates, end coordinates and the
+            tuples of gene information (see get_gene_intervals_pt), or None if the
+            annotation file has changed since it was written.
+    """
+    with numpy.load(path) as sidecar:
+        if not numpy.array_equal(sidecar["signature"], signature):
+            return None
+        orfs = [sys.intern(orf) for orf in sidecar["orfs"].tolist()]
+        starts = sidecar["starts"].tolist()
+        ends = sidecar["ends"].tolist()
+        names = [sys.intern(name) for name in sidecar["names"].tolist()]
+        descs = [sys.intern(desc) for desc in sidecar["descs"].tolist()]
+        strands = [sys.intern(strand) for strand in sidecar["strands"].tolist()]
+    info = list(zip(names, descs, starts, ends, strands))
+    return (orfs, starts, ends, info)
 
+#
 
 def get_pos_hash_pt(path):
     """Returns a dictionary that maps coordinates to a list of genes that occur at that coordinate.
@@ -1208,19 +2681,9 @@ def get_pos_hash_pt(path):
         path (str): Path to annotation in .prot_table format.
 
     Returns:
-        dict: Dictionary of position to list of genes that share that position.
+        PosHash: Dictionary-like object of position to list of genes that share that position.
     """
-    hash = {}
-    for line in open(path):
-        if line.startswith("#"): continue
-        tmp = line.strip().split("\t")
-        orf = tmp[8]
-        start = int(tmp[1])
-        end = int(tmp[2])
-        for pos in range(start, end+1):
-            if pos not in hash: hash[pos] = []
-            hash[pos].append(orf)
-    return hash
+    return PosHash(get_annotation_index(path))
 
 #
 
@@ -1231,23 +2694,9 @@ def get_pos_hash_gff(path):
         path (str): Path to annotation in GFF3 format.
 
     Returns:
-        dict: Dictionary of position to list of genes that share that position.
+        PosHash: Dictionary-like object of position to list of genes that share that position.
     """
-    hash = {}
-    for line in open(path):
-        if line.startswith("#"): continue
-        tmp = line.strip().split("\t")
-        features = dict([tuple(f.split("=",1)) for f in filter(lambda x: "=" in x, tmp[8].split(";"))])
-        if "ID" not in features: continue
-        orf = features["ID"]
-        chr = tmp[0]
-        type = tmp[2]
-        start = int(tmp[3])
-        end = int(tmp[4])
-        for pos in range(start, end+1):
-            if pos not in hash: hash[pos] = []
-            hash[pos].append(orf)
-    return hash
+    return PosHash(get_annotation_index(path))
 
 #
 
@@ -1258,10 +2707,14 @@ def get_pos_hash(path):
         path (str): Path to annotation in .prot_table or GFF3 format.
 
     Returns:
-        dict: Dictionary of position to list of genes that share that position.
+        PosHash: Dictionary-like object of position to list of genes that share that position.
+
+    .. note:: The path may also be a TnSeq dataset bundle that includes an annotation,
+        in which case only the coordinates of the sites of the bundle are included.
     """
-    filename, file_extension = os.path.splitext(path)
-    if file_extension.lower() in [".gff", ".gff3"]:
+    if is_dataset_bundle(path):
+        return get_bundle_pos_hash(read_dataset_bundle(path))
+    if get_file_extension(path) in [".gff", ".gff3"]:
         return get_pos_hash_gff(path)
     else:
         return get_pos_hash_pt(path)
@@ -1284,7 +2737,7 @@ def get_gene_info_pt(path):
 
     """
     orf2info = {}
-    for line in open(path):
+    for line in open_file(path):
         if line.startswith("#"): continue
         tmp = line.strip().split("\t")
         orf = tmp[8]
@@ -1314,7 +2767,7 @@ def get_gene_info_gff(path):
 
     """
     orf2info = {}
-    for line in open(path):
+    for line in open_file(path):
         if line.startswith("#"): continue
         tmp = line.strip().split("\t")
         chr = tmp[0]
@@ -1354,12 +2807,27 @@ def get_gene_info(path):
             - end coordinate
             - strand
 
+    .. note:: The path may also be a TnSeq dataset bundle that includes an annotation.
     """
-    filename, file_extension = os.path.splitext(path)
-    if file_extension.lower() in [".gff", ".gff3"]:
-        return get_gene_info_gff(path)
-    else:
-        return get_gene_info_pt(path)
+    if is_dataset_bundle(path):
+        return read_dataset_bundle(path)["gene_info"]
+    return get_annotation_index(path).get_gene_info()
+
+#
+
+def get_gene_ids(path):
+    """Returns the ids of the genes of an annotation, in the order of the file.
+
+    Arguments:
+        path (str): Path to annotation in .prot_table or GFF3 format, or a
+            TnSeq dataset bundle that includes an annotation.
+
+    Returns:
+        list: List with the id of each gene (ORF).
+    """
+    if is_dataset_bundle(path):
+        return read_dataset_bundle(path)["gene_ids"]
+    return list(get_annotation_index(path).orfs)
 
 #
 
@@ -1405,16 +2873,14 @@ def read_genome(path):
     """Reads in FASTA formatted genome file.
 
     Arguments:
-        path (str): Path to .galign file.
+        path (str): Path to FASTA file.
 
     Returns:
-        string: String with the genomic sequence.
+        string: String with the genomic sequence (all records concatenated).
+
+    .. seealso:: :class:`pytransit.fasta_tools.get_sequence`
     """
-    seq = ""
-    for line in open(path):
-        if line.startswith(">"): continue
-        seq += line.strip()
-    return seq
+    return fasta_tools.read_sequence(path)
 
 #
 
@@ -1626,7 +3092,7 @@ def get_genes_in_range(pos_hash, start, end):
     """Returns list of genes that occur in a given range of coordinates.
 
     Arguments:
-        pos_hash (dict): Dictionary of position to list of genes.
+        pos_hash (dict): Dictionary (or PosHash) of position to list of genes.
         start (int): Start coordinate of the desired range.
         end (int): End coordinate of the desired range.
 
@@ -1635,6 +3101,9 @@ def get_genes_in_range(pos_hash, start, end):
 
     """
 
+    if isinstance(pos_hash, PosHash):
+        return pos_hash.index.genes_in_range(start, end)
+
     genes = set()
     for pos in range(start, end + 1):
         if pos in pos_hash:
@@ -1642,6 +3111,53 @@ def get_genes_in_range(pos_hash, start, end):
 
     return list(sorted(genes))
 
+#
+
+def get_run_gene_overlaps(run_starts, run_ends, gene_starts, gene_ends, size_starts=None, size_ends=None):
+    """Returns all the pairs of runs and genes that overlap, with the size of each overlap.
+
+    The sorted runs are merged against the genes in a single vectorized pass (binary
+    search of the start and end of each gene among the run boundaries), instead of
+    looking up the genes at every coordinate of every run.
+
+    Arguments:
+        run_starts (list): Start coordinates of the runs, sorted and non-overlapping
+            (e.g. as returned by runs_w_info).
+        run_ends (list): End coordinates of the runs (inclusive).
+        gene_starts (list): Start coordinates of the genes, in any order.
+        gene_ends (list): End coordinates of the genes (inclusive). Genes that end
+            before they start are ignored.
+        size_starts (list): Start coordinates used to measure the size of each overlap
+            (e.g. the genes trimmed at their N/C-terminus). Defaults to gene_starts.
+        size_ends (list): End coordinates used to measure the size of each overlap.
+            Defaults to gene_ends.
+
+    Returns:
+        tuple: Numpy arrays (run_index, gene_index, size) with one entry per overlapping
+            pair, sorted by gene and then run. Size is the number of coordinates shared
+            by the run and the gene (measured with size_starts/size_ends, so it can be
+            zero or negative for runs that only overlap the trimmed ends).
+    """
+    run_starts = numpy.asarray(run_starts, dtype=numpy.int64)
+    run_ends = numpy.asarray(run_ends, dtype=numpy.int64)
+    gene_starts = numpy.asarray(gene_starts, dtype=numpy.int64)
+    gene_ends = numpy.asarray(gene_ends, dtype=numpy.int64)
+
+    # Runs overlapping a gene are contiguous: the first one ending at or after the
+    # start of the gene, up to the last one starting at or before its end.
+    lo = numpy.searchsorted(run_ends, gene_starts, side="left")
+    hi = numpy.searchsorted(run_starts, gene_ends, side="right")
+    counts = numpy.maximum(hi - lo, 0)
+    counts[gene_ends < gene_starts] = 0
+
+    gene_index = numpy.repeat(numpy.arange(len(gene_starts)), counts)
+    offset = numpy.arange(len(gene_index)) - numpy.repeat(numpy.cumsum(counts) - counts, counts)
+    run_index = lo[gene_index] + offset
+    size_starts = gene_starts if size_starts is None else numpy.asarray(size_starts, dtype=numpy.int64)
+    size_ends = gene_ends if size_ends is None else numpy.asarray(size_ends, dtype=numpy.int64)
+    size = numpy.minimum(run_ends[run_index], size_ends[gene_index]) - numpy.maximum(run_starts[run_index], size_starts[gene_index]) + 1
+    return (run_index, gene_index, size)
+
 
 
 if __name__ == "__main__":
@@ -344,8 +344,9 @@ def get_pos_hash(path):
     Returns:
         dict: Dictionary of position to list of genes that share that position.
     """
-    filename, file_extension = os.path.splitext(path)
-    if file_extension.lower() in [".gff", ".gff3"]:
+    if tnseq_tools.is_dataset_bundle(path):
+        return tnseq_tools.get_pos_hash(path)
+    if tnseq_tools.get_file_extension(path) in [".gff", ".gff3"]:
         return tnseq_tools.get_pos_hash_gff(path)
     else:
         return tnseq_tools.get_pos_hash_pt(path)
@@ -360,8 +361,7 @@ def get_extended_pos_hash(path):
     Returns:
         dict: Dictionary of position to list of genes that share that position.
     """
-    filename, file_extension = os.path.splitext(path)
-    if file_extension.lower() in [".gff", ".gff3"]:
+    if tnseq_tools.get_file_extension(path) in [".gff", ".gff3"]:
         return tnseq_tools.get_extended_pos_hash_gff(path)
     else:
         return tnseq_tools.get_extended_pos_hash_pt(path)
@@ -383,11 +383,7 @@ def get_gene_info(path):
             - strand
             
     """
-    filename, file_extension = os.path.splitext(path)
-    if file_extension.lower() in [".gff", ".gff3"]:
-        return tnseq_tools.get_gene_info_gff(path)
-    else:
-        return tnseq_tools.get_gene_info_pt(path)
+    return tnseq_tools.get_gene_info(path)
 
 
 def convertToIGV(self, dataset_list, annotationPath, path, normchoice=None):
@@ -498,13 +494,14 @@ def convertToGeneCountSummary(dataset_list, annotationPath, outputPath, normchoi
 
 
 
-def get_validated_data(wig_list, wxobj=None):
+def get_validated_data(wig_list, wxobj=None, sparse=False):
     """ Returns a tuple of (data, position) containing a matrix of raw read-counts
         , and list of coordinates. 
 
     Arguments:
-        wig_list (list): List of paths to wig files.
+        wig_list (list): List of paths to wig files, or to a single TnSeq dataset bundle.
         wxobj (object): wxPython GUI object for warnings
+        sparse (bool): Return zero-filled (Tn5) data as a scipy.sparse matrix.
 
     Returns:
         tuple: Two lists containing data and positions of the wig files given.
@@ -524,13 +521,13 @@ def get_validated_data(wig_list, wxobj=None):
 
     # Regular file with empty sites
     if status == 0:
-        return tnseq_tools.get_data(wig_list)    
+        return tnseq_tools.get_cached_data(wig_list)
     # No empty sites, decided to proceed as Himar1
     elif status == 1:
-        return tnseq_tools.get_data_w_genome(wig_list, genome)
+        return tnseq_tools.get_cached_data(wig_list, "genome", genome)
     # No empty sites, decided to proceed as Tn5
     elif status == 2:
-        return tnseq_tools.get_data_zero_fill(wig_list)
+        return tnseq_tools.get_cached_data(wig_list, "zero_fill", sparse=sparse)
     # Didn't choose either.... what!?
     else:
         return tnseq_tools.get_data([])
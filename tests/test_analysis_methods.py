@@ -8,6 +8,7 @@ basedir = os.path.dirname(__file__)
 sys.path.insert(0, basedir + '/../src/')
 
 import shutil
+import tempfile
 import unittest
 
 from transit_test import *
@@ -32,6 +33,9 @@ from pytransit.analysis.utest import UTestMethod
 # Genetic Interactions
 from pytransit.analysis.gi import GIMethod
 
+# Exports
+from pytransit.export.genes import GenesMethod
+
 hasR = False
 try:
     import rpy2.robjects
@@ -82,6 +86,32 @@ class TestMethods(TransitTestCase):
                 2,
                 "sig_qvals expected in range: %s, actual: %d" % ("[33, 37]", len(sig_qvals)))
 
+
+    def test_resampling_snapshots(self):
+        temp_dir = tempfile.mkdtemp()
+        try:
+            ctrl_path = os.path.join(temp_dir, "ctrl.genes")
+            exp_path = os.path.join(temp_dir, "exp.genes")
+            GenesMethod.fromargs([ctrl_data_txt, small_annotation, ctrl_path]).Run()
+            GenesMethod.fromargs([exp_data_txt, small_annotation, exp_path]).Run()
+            self.assertTrue(tnseq_tools.is_genes_snapshot(ctrl_path))
+            G = ResamplingMethod.fromargs([ctrl_path, exp_path, small_annotation, output])
+            G.Run()
+            self.assertTrue("norm=TTR" in open(output).read())
+            (sig_pvals, sig_qvals) = (significant_pvals_qvals(output, pcol=-2, qcol=-1))
+            self.assertLessEqual(
+                    abs(len(sig_pvals) - 37),
+                    2,
+                    "sig_pvals expected in range: %s, actual: %d" % ("[35, 39]", len(sig_qvals)))
+            # The normalization of the snapshots can not be overridden
+            for flags in [["-n", "nzmean"], ["-l"]]:
+                G = ResamplingMethod.fromargs([ctrl_path, exp_path, small_annotation, output] + flags)
+                G.Run()
+                G.output.close()
+                self.assertEqual(os.path.getsize(output), 0)
+        finally:
+            shutil.rmtree(temp_dir)
+
     def test_resampling_combined_wig(self):
         # The conditions in the args should be matched case-insensitively.
         args = ["-c", combined_wig, samples_metadata, "Glycerol", "cholesterol", small_annotation, output, "-a"]
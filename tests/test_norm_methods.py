@@ -8,6 +8,8 @@ import shutil
 import unittest
 import os
 import numpy
+import scipy.stats
+import warnings
 
 from transit_test import *
 
@@ -59,6 +61,61 @@ class TestNormMethods(TransitTestCase):
         self.assertFalse((factors == numpy.ones(N)).all())
         for k in range(N):
            self.assertNotEqual(numpy.mean(norm_data[k]), raw_means[k])
+
+
+    def test_quantile(self):
+        data = numpy.array([[5., 2., 3., 4.], [4., 1., 4., 2.], [3., 4., 6., 8.]])
+        norm_data,factors = norm_tools.normalize_data(data, "quantile")
+        # Mean of the sorted datasets is [2, 3, 4.67, 5.67]; ties share the same (dense) rank
+        expected = numpy.array([[17/3., 2., 3., 14/3.], [14/3., 2., 14/3., 3.], [2., 3., 14/3., 17/3.]])
+        self.assertTrue(numpy.allclose(norm_data, expected))
+
+
+    def test_ecdf_geom_ppf(self):
+        numpy.random.seed(0)
+        S = numpy.random.geometric(0.05, size=1000)
+        X = numpy.array([0, 1, 5, 5, 20, 80, 1000, 3])
+        mapped = norm_tools.ecdf_geom_ppf(S, X, 0.02)
+        expected = [norm_tools.cleaninfgeom(scipy.stats.geom.ppf(norm_tools.ecdf(S, x), 0.02), 0.02) for x in X]
+        self.assertEqual(list(mapped), expected)
+
+
+    def test_parallel_normalization(self):
+        data,position = tnseq_tools.get_data(all_data_list[:3])
+        data = data[:,:5000]
+        numpy.random.seed(0)
+        norm_data,factors = norm_tools.normalize_data(data, "betageom", cache=False, workers=1)
+        numpy.random.seed(0)
+        parallel_data,parallel_factors = norm_tools.normalize_data(data, "betageom", cache=False, workers=2)
+        self.assertTrue(numpy.array_equal(norm_data, parallel_data))
+        self.assertEqual(factors, parallel_factors)
+        factors = norm_tools.zinfnb_factors(data, workers=1)
+        self.assertTrue(numpy.array_equal(norm_tools.zinfnb_factors(data, workers=2), factors))
+
+    def test_norm_workers_setting(self):
+        workers = norm_tools.norm_workers
+        try:
+            norm_tools.norm_workers = "auto"
+            with warnings.catch_warnings(record=True) as caught:
+                warnings.simplefilter("always")
+                self.assertEqual(norm_tools.map_datasets(abs, [-1, -2]), [1, 2])
+            self.assertEqual(len(caught), 1)
+        finally:
+            norm_tools.norm_workers = workers
+
+
+    def test_zinfnb_histogram(self):
+        data,position = tnseq_tools.get_data(all_data_list[:1])
+        values,weights = numpy.unique(data[0], return_counts=True)
+        weights = weights.astype(float)
+        params = [0.3, 10, 0.5]
+        (negLL, grad) = norm_tools.Fzinfnb_hist(params, values, weights)
+        self.assertAlmostEqual(negLL, norm_tools.Fzinfnb(params, data[0]), delta=1e-6*negLL)
+        for i in range(3):
+            step = numpy.zeros(3)
+            step[i] = 1e-6
+            diff = (norm_tools.Fzinfnb_hist(params + step, values, weights)[0] - norm_tools.Fzinfnb_hist(params - step, values, weights)[0])/2e-6
+            self.assertAlmostEqual(grad[i], diff, delta=1e-4*abs(diff))
 #    """
 
     def test_resampling_nonorm(self):
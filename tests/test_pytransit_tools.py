@@ -2,10 +2,14 @@ import sys
 sys.path.insert(0, '../src/')
 
 import os
+import gzip
 import shutil
+import tempfile
+import warnings
 import unittest
 import os
 import numpy
+from unittest import mock
 
 from transit_test import *
 
@@ -13,6 +17,7 @@ import pytransit.norm_tools as norm_tools
 import pytransit.tnseq_tools as tnseq_tools
 import pytransit.stat_tools as stat_tools
 import pytransit.transit_tools as transit_tools
+import pytransit.fasta_tools as fasta_tools
 
 
 
@@ -26,6 +31,290 @@ class TestTnSeqTools(TransitTestCase):
         self.assertEqual(K, 5)
         self.assertGreater(N, 70000)
 
+    def test_read_wig(self):
+        data,position = tnseq_tools.get_data(all_data_list)
+        pos,reads = tnseq_tools.read_wig(all_data_list[1])
+        self.assertTrue(numpy.array_equal(pos, position))
+        self.assertTrue(numpy.array_equal(reads, data[1]))
+        temp_dir = tempfile.mkdtemp()
+        try:
+            wig_path = os.path.join(temp_dir, "test.wig")
+            with open(wig_path, "w") as f:
+                f.write("variableStep chrom=test\n60 5 1\n72\t3\n102 0 7\n130 2\n")
+            pos,reads = tnseq_tools.read_wig(wig_path)
+            self.assertEqual(list(pos), [60, 72, 102, 130])
+            self.assertEqual(list(reads), [5, 3, 0, 2])
+            # The total number of columns is even, but the lines must not be paired across
+            with open(wig_path, "w") as f:
+                f.write("variableStep chrom=test\n60 5 1\n72\n102 0\n")
+            self.assertRaises(ValueError, tnseq_tools.read_wig, wig_path)
+            self.assertEqual(list(tnseq_tools.count_line_columns("1 2 3\n4\n 5  6\n", 3)), [3, 1, 2])
+        finally:
+            shutil.rmtree(temp_dir)
+
+    def test_read_data_parallel(self):
+        data,position = tnseq_tools.get_data(all_data_list, workers=1)
+        pdata,pposition = tnseq_tools.get_data(all_data_list, workers=2)
+        self.assertTrue(numpy.array_equal(pdata, data))
+        self.assertTrue(numpy.array_equal(pposition, position))
+        zdata,zposition = tnseq_tools.get_data_zero_fill(all_data_list[:2], workers=2)
+        self.assertTrue(numpy.array_equal(zdata[:,position-1], data[:2]))
+        sdata,sposition = tnseq_tools.get_data_zero_fill(all_data_list[:2], sparse=True, workers=2)
+        self.assertTrue(numpy.array_equal(sdata.toarray(), zdata))
+
+    def test_workers_setting(self):
+        workers = tnseq_tools.data_workers
+        try:
+            tnseq_tools.data_workers = "auto"
+            with warnings.catch_warnings(record=True) as caught:
+                warnings.simplefilter("always")
+                self.assertEqual(tnseq_tools.get_workers(None, 4), 1)
+            self.assertEqual(len(caught), 1)
+            tnseq_tools.data_workers = "3"
+            self.assertEqual(tnseq_tools.get_workers(None, 4), 3)
+        finally:
+            tnseq_tools.data_workers = workers
+
+    def test_read_data_dtype(self):
+        data,position = tnseq_tools.get_data(all_data_list[:2])
+        idata,iposition = tnseq_tools.get_data(all_data_list[:2], dtype="int32")
+        self.assertEqual(idata.dtype, numpy.int32)
+        self.assertTrue(numpy.array_equal(idata, data))
+        norm_data,factors = norm_tools.normalize_data(data, "TTR")
+        fnorm_data,ffactors = norm_tools.normalize_data(idata, "TTR", dtype="float32")
+        self.assertEqual(fnorm_data.dtype, numpy.float32)
+        self.assertTrue(numpy.allclose(fnorm_data, norm_data, rtol=1e-6))
+        sdata,sposition = tnseq_tools.get_data_zero_fill(all_data_list[:2], sparse=True, dtype="int32")
+        self.assertEqual(sdata.dtype, numpy.int32)
+        ndata,nfactors = norm_tools.normalize_data(idata, "nonorm")
+        self.assertEqual(ndata.dtype, numpy.float64)
+        self.assertTrue(norm_tools.get_float_data(data) is data)
+
+    def test_wig_format(self):
+        temp_dir = tempfile.mkdtemp()
+        try:
+            wig_path = os.path.join(temp_dir, "test.wig")
+            tn5_path = os.path.join(temp_dir, "tn5.wig")
+            shutil.copy(mini_wig, wig_path)
+            with open(tn5_path, "w") as f:
+                f.write("variableStep chrom=test\n1 5\n2 3\n3 1\n")
+            with mock.patch.object(tnseq_tools, "open_file", wraps=tnseq_tools.open_file) as opened:
+                self.assertEqual(tnseq_tools.check_wig_includes_zeros([wig_path, tn5_path]), [True, False])
+                self.assertEqual(tnseq_tools.get_file_types([wig_path, tn5_path]), ["himar1", "tn5"])
+                data,position = tnseq_tools.get_data([wig_path])
+                # Each file is scanned once for both checks, and then loaded
+                self.assertEqual(opened.call_count, 3)
+            self.assertEqual(tnseq_tools.scan_wig_format(wig_path), {"type": "himar1", "includes_zeros": True})
+        finally:
+            shutil.rmtree(temp_dir)
+
+    def test_read_data_zero_fill(self):
+        data,position = tnseq_tools.get_data(all_data_list)
+        zdata,zposition = tnseq_tools.get_data_zero_fill(all_data_list)
+        self.assertEqual(zdata.shape[1], position[-1])
+        self.assertTrue(numpy.array_equal(zdata[:,position-1], data))
+
+    def test_read_data_zero_fill_sparse(self):
+        data,position = tnseq_tools.get_data_zero_fill(all_data_list[:2])
+        sdata,sposition = tnseq_tools.get_data_zero_fill(all_data_list[:2], sparse=True)
+        self.assertEqual(sdata.nnz, numpy.sum(data > 0))
+        self.assertTrue(numpy.array_equal(sdata.toarray(), data))
+        self.assertTrue(numpy.array_equal(tnseq_tools.combine_replicates(sdata, "Sum"), tnseq_tools.combine_replicates(data, "Sum")))
+        norm_data,factors = norm_tools.normalize_data(data, "TTR")
+        snorm_data,sfactors = norm_tools.normalize_data(sdata, "TTR")
+        self.assertTrue(numpy.allclose(sfactors, factors))
+        self.assertTrue(numpy.allclose(snorm_data.toarray(), norm_data))
+        temp_dir = tempfile.mkdtemp()
+        try:
+            # Repeated coordinates keep their last read-count in both layouts
+            wig_path = os.path.join(temp_dir, "test.wig")
+            with open(wig_path, "w") as f:
+                f.write("variableStep chrom=test\n2 5\n4 3\n2 1\n4 0\n")
+            data,position = tnseq_tools.get_data_zero_fill([wig_path])
+            sdata,sposition = tnseq_tools.get_data_zero_fill([wig_path], sparse=True)
+            self.assertEqual(data.tolist(), [[0, 1, 0, 0]])
+            self.assertEqual(sdata.toarray().tolist(), data.tolist())
+        finally:
+            shutil.rmtree(temp_dir)
+
+    def test_read_data_w_genome(self):
+        temp_dir = tempfile.mkdtemp()
+        try:
+            genome_path = os.path.join(temp_dir, "test.fna")
+            wig_path = os.path.join(temp_dir, "test.wig")
+            with open(genome_path, "w") as f:
+                f.write(">test\nGGTACCTA\ntaTTAA\n")
+            with open(wig_path, "w") as f:
+                f.write("variableStep chrom=test\n3 5\n9 2\n")
+            sites = tnseq_tools.get_ta_sites(genome_path)
+            self.assertEqual(list(sites), [3, 7, 9, 12])
+            self.assertTrue(os.path.exists(genome_path + ".tasites.npz"))
+            self.assertEqual(list(tnseq_tools.get_site_indexes(sites, [9, 4, 12, 20])), [2, -1, 3, -1])
+            data,position = tnseq_tools.get_data_w_genome([wig_path], genome_path)
+            self.assertTrue(numpy.array_equal(position, sites))
+            self.assertEqual(list(data[0]), [5, 0, 2, 0])
+            pdata,pposition = tnseq_tools.get_data_w_genome([wig_path, wig_path], genome_path, workers=2)
+            self.assertEqual(pdata.tolist(), [[5, 0, 2, 0], [5, 0, 2, 0]])
+        finally:
+            shutil.rmtree(temp_dir)
+
+    def test_fasta_records(self):
+        temp_dir = tempfile.mkdtemp()
+        try:
+            fasta_path = os.path.join(temp_dir, "test.fna")
+            with open(fasta_path, "w") as f:
+                f.write(">chr1 first replicon\nACGT\nTTAA\n>plasmid\r\nggta\r\n")
+            self.assertEqual(fasta_tools.get_record_names(fasta_path), ["chr1", "plasmid"])
+            self.assertEqual(fasta_tools.get_sequence(fasta_path, 0), "ACGTTTAA")
+            self.assertEqual(fasta_tools.get_sequence(fasta_path, "plasmid"), "ggta")
+            self.assertEqual(fasta_tools.get_sequence(fasta_path, 2), "")
+            self.assertEqual(tnseq_tools.read_genome(fasta_path), "ACGTTTAAggta")
+        finally:
+            shutil.rmtree(temp_dir)
+
+    def test_read_compressed_files(self):
+        temp_dir = tempfile.mkdtemp()
+        try:
+            wig_path = os.path.join(temp_dir, "test.wig.gz")
+            annotation_path = os.path.join(temp_dir, "test.prot_table.gz")
+            for (src, dst) in [(ctrl_rep1, wig_path), (small_annotation, annotation_path)]:
+                with open(src, "rb") as f_in, gzip.open(dst, "wb") as f_out:
+                    shutil.copyfileobj(f_in, f_out)
+            data,position = tnseq_tools.get_data([ctrl_rep1])
+            gz_data,gz_position = tnseq_tools.get_data([wig_path])
+            self.assertTrue(numpy.array_equal(gz_data, data))
+            self.assertEqual(tnseq_tools.get_file_types([wig_path]), ["himar1"])
+            self.assertEqual(tnseq_tools.check_wig_includes_zeros([wig_path]), [True])
+            self.assertEqual(tnseq_tools.get_gene_info(annotation_path), tnseq_tools.get_gene_info(small_annotation))
+        finally:
+            shutil.rmtree(temp_dir)
+
+    def test_cached_data(self):
+        cache_dir = tempfile.mkdtemp()
+        try:
+            wig_path = os.path.join(cache_dir, "test.wig")
+            shutil.copy(mini_wig, wig_path)
+            data,position = tnseq_tools.get_data([wig_path])
+            cold = tnseq_tools.get_cached_data([wig_path], cache_dir=cache_dir)
+            warm = tnseq_tools.get_cached_data([wig_path], cache_dir=cache_dir)
+            self.assertTrue(os.path.exists(tnseq_tools.get_data_cache_path([wig_path], cache_dir=cache_dir)))
+            self.assertTrue(numpy.array_equal(cold[0], data))
+            self.assertTrue(numpy.array_equal(warm[0], data))
+            self.assertTrue(numpy.array_equal(warm[1], position))
+
+            # Modifying the wig file invalidates the cached entry
+            with open(wig_path, "a") as f:
+                f.write("%d 7\n" % (position[-1] + 10))
+            stale = tnseq_tools.get_cached_data([wig_path], cache_dir=cache_dir)
+            self.assertEqual(stale[0].shape[1], data.shape[1] + 1)
+        finally:
+            shutil.rmtree(cache_dir)
+
+    def test_read_combined_wig_selected_files(self):
+        sites,data,files = tnseq_tools.read_combined_wig(combined_wig)
+        selected = [files[3], files[1]]
+        s_sites,s_data,s_files = tnseq_tools.read_combined_wig(combined_wig, files=selected, dtype=numpy.float32)
+        self.assertEqual(s_files, [files[1], files[3]])
+        self.assertEqual(s_data.dtype, numpy.float32)
+        self.assertTrue(numpy.array_equal(s_sites, sites))
+        self.assertTrue(numpy.allclose(s_data, data[[1,3]]))
+
+    def test_dataset_bundle(self):
+        temp_dir = tempfile.mkdtemp()
+        try:
+            bundle_path = os.path.join(temp_dir, "test.tnbundle")
+            data,position = tnseq_tools.get_data(all_data_list[:2])
+            tnseq_tools.write_dataset_bundle(bundle_path, data, position, all_data_list[:2], small_annotation)
+            self.assertTrue(tnseq_tools.is_dataset_bundle(bundle_path))
+            self.assertFalse(tnseq_tools.is_dataset_bundle(small_annotation))
+            sites,counts,files = tnseq_tools.read_combined_wig(bundle_path, files=[all_data_list[1]])
+            self.assertEqual(files, [all_data_list[1]])
+            self.assertTrue(numpy.array_equal(counts, data[1:2]))
+            bdata,bposition = transit_tools.get_validated_data([bundle_path])
+            self.assertTrue(numpy.array_equal(bdata, data))
+            self.assertTrue(numpy.array_equal(bposition, position))
+            G = tnseq_tools.Genes(all_data_list[:2], small_annotation)
+            bG = tnseq_tools.Genes([bundle_path], bundle_path)
+            self.assertEqual([gene.orf for gene in bG], [gene.orf for gene in G])
+            self.assertTrue(numpy.array_equal(bG[0].reads, G[0].reads))
+        finally:
+            shutil.rmtree(temp_dir)
+
+    def test_annotation_index(self):
+        index = tnseq_tools.AnnotationIndex(["a", "b", "c", "region"], [10, 15, 40, 1], [20, 30, 50, 1000])
+        self.assertEqual(index.genes_at(5), ["region"])
+        self.assertEqual(index.genes_at(17), ["a", "b", "region"])
+        self.assertEqual(index.genes_at(2000), [])
+        (indptr, indices) = index.genes_at_positions([5, 17, 35, 2000])
+        self.assertEqual(list(indptr), [0, 1, 4, 5, 5])
+        self.assertEqual(list(indices), [3, 0, 1, 3, 3])
+        self.assertEqual(index.genes_in_range(25, 45), ["b", "c", "region"])
+        pos_hash = tnseq_tools.PosHash(index)
+        self.assertEqual(pos_hash.get(2000, []), [])
+        self.assertTrue(45 in pos_hash)
+        self.assertEqual(len(pos_hash), 1000)
+        pos_hash = tnseq_tools.get_pos_hash(small_annotation)
+        gene_info = tnseq_tools.get_gene_info(small_annotation)
+        (name, desc, start, end, strand) = gene_info["Rv0244c"]
+        self.assertTrue("Rv0244c" in pos_hash[start])
+        self.assertTrue("Rv0244c" in tnseq_tools.get_genes_in_range(pos_hash, end, end+100))
+
+    def test_annotation_cache(self):
+        temp_dir = tempfile.mkdtemp()
+        try:
+            annotation_path = os.path.join(temp_dir, "test.prot_table")
+            shutil.copy(small_annotation, annotation_path)
+            index = tnseq_tools.get_annotation_index(annotation_path, cache=True)
+            self.assertTrue(os.path.exists(annotation_path + ".annotation.npz"))
+            self.assertTrue(tnseq_tools.get_annotation_index(annotation_path) is index)
+            self.assertTrue(index.orfs[0] is sys.intern(index.orfs[0]))
+
+            tnseq_tools._annotation_index_cache.clear()
+            with mock.patch.object(tnseq_tools, "open_file", wraps=tnseq_tools.open_file) as opened:
+                cached = tnseq_tools.get_annotation_index(annotation_path, cache=True)
+                self.assertEqual(opened.call_count, 0)
+            self.assertEqual(cached.get_gene_info(), index.get_gene_info())
+            self.assertEqual(cached.get_gene_info(), tnseq_tools.get_gene_info_pt(annotation_path))
+            genes = tnseq_tools.read_genes(annotation_path, descriptions=True)
+            self.assertEqual([g["rv"] for g in genes], tnseq_tools.get_gene_ids(annotation_path))
+
+            with open(annotation_path, "a") as f:
+                f.write("new gene\t5000001\t5000100\t+\t33\t-\t-\tnewA\tRvNEW\t-\n")
+            self.assertTrue("RvNEW" in tnseq_tools.get_gene_info(annotation_path))
+        finally:
+            shutil.rmtree(temp_dir)
+
+    def test_gene_neighbor_index(self):
+        index = tnseq_tools.GeneNeighborIndex(["a", "b", "c"], [5, 15, 40], [20, 30, 50])
+        self.assertEqual(index.get(2), {"current": [], "prev": [""], "next": ["a"]})
+        self.assertEqual(index.get(17), {"current": ["a", "b"], "prev": ["", "a"], "next": ["b", "c"]})
+        self.assertEqual(index.get(35), {"current": [], "prev": ["b"], "next": ["c"]})
+        self.assertEqual(index.get(60), None)
+        (indptr, prev, current, next) = index.neighbors_at_positions([2, 45])
+        self.assertEqual(list(indptr), [0, 1, 2])
+        self.assertEqual((list(prev), list(current), list(next)), ([-1, 1], [-1, 2], [0, -1]))
+
+    def test_run_gene_overlaps(self):
+        runs = tnseq_tools.runs_w_info([1, 0, 0, 0, 1, 0, 0, 1, 1, 0])
+        run_starts = [run["start"] for run in runs]
+        run_ends = [run["end"] for run in runs]
+        (run_index, gene_index, size) = tnseq_tools.get_run_gene_overlaps(run_starts, run_ends, [3, 1, 9, 5], [7, 10, 8, 5])
+        self.assertEqual(list(zip(run_index, gene_index, size)), [(0, 0, 2), (1, 0, 2), (0, 1, 3), (1, 1, 2), (2, 1, 1)])
+        (run_index, gene_index, size) = tnseq_tools.get_run_gene_overlaps(run_starts, run_ends, [3, 1], [7, 10], [5, 1], [7, 7])
+        self.assertEqual(list(zip(run_index, gene_index, size)), [(0, 0, 0), (1, 0, 2), (0, 1, 3), (1, 1, 2), (2, 1, -2)])
+
+    def test_rv_siteindexes_map(self):
+        genes = [{"rv": "A", "gene": "a", "start": 10, "end": 53, "strand": "+"},
+                 {"rv": "B", "gene": "b", "start": 10, "end": 53, "strand": "-"}]
+        sites = numpy.array([5, 10, 14, 20, 30, 40, 50, 53, 60])
+        site_map = tnseq_tools.rv_siteindexes_map(genes, sites)
+        self.assertEqual(list(site_map["A"]), [1, 2, 3, 4, 5, 6])
+        self.assertEqual(list(site_map["B"]), [2, 3, 4, 5, 6, 7])
+        site_map = tnseq_tools.rv_siteindexes_map(genes, {co: i for i, co in enumerate(sites)}, nterm=25, cterm=25)
+        self.assertEqual(list(site_map["A"]), [3, 4, 5])
+        slices = tnseq_tools.rv_siteindexes_map(genes, sites, nterm=25, cterm=25, slices=True)
+        self.assertEqual(list(sites[slices["B"]]), [30, 40])
+
     def test_genes_creation_fromwig(self):
         G = tnseq_tools.Genes(all_data_list, annotation)
         N = len(G)
@@ -62,6 +351,67 @@ class TestTnSeqTools(TransitTestCase):
         self.assertEqual(G[0].name, test_name)
 
 
+    def test_genes_site_trimming(self):
+        temp_dir = tempfile.mkdtemp()
+        try:
+            annotation_path = os.path.join(temp_dir, "test.prot_table")
+            with open(annotation_path, "w") as f:
+                f.write("gene a\t1\t100\t+\t33\t0\t0\tgA\tA\t-\n")
+                f.write("gene b\t90\t200\t-\t37\t0\t0\tgB\tB\t-\n")
+            position = numpy.array([2, 50, 95, 98, 150, 199])
+            data = numpy.ones((1, len(position)))
+            G = tnseq_tools.Genes([], annotation_path, data=data, position=position)
+            self.assertEqual(list(G["A"].position), [2, 50, 95])
+            self.assertEqual(list(G["B"].position), [95, 98, 150, 199])
+            G = tnseq_tools.Genes([], annotation_path, data=data, position=position, ignoreCodon=False, nterm=10, cterm=10)
+            self.assertEqual(list(G["A"].position), [50])
+            self.assertEqual(list(G["B"].position), [150])
+        finally:
+            shutil.rmtree(temp_dir)
+
+    def test_gene_run_stats(self):
+        numpy.random.seed(0)
+        reads = numpy.random.binomial(1, 0.3, size=(2, 200)) * 5
+        position = numpy.cumsum(numpy.random.randint(1, 20, size=200))
+        site_start = numpy.array([0, 10, 15, 50, 50, 120, 199])
+        site_end = numpy.array([30, 12, 90, 50, 51, 200, 200])
+        stats = tnseq_tools.get_gene_run_stats(tnseq_tools.tossify(reads), position, site_start, site_end)
+        for i in range(len(site_start)):
+            gene = tnseq_tools.Gene("g%d" % i, "", "", reads[:, site_start[i]:site_end[i]], position[site_start[i]:site_end[i]])
+            self.assertEqual([stat[i] for stat in stats], [gene.k, gene.n, gene.r, gene.s, gene.t])
+
+    def test_genes_views(self):
+        G = tnseq_tools.Genes(all_data_list[:2], small_annotation)
+        gene = G["Rv0244c"]
+        self.assertTrue(isinstance(gene, tnseq_tools.Gene))
+        self.assertTrue(numpy.shares_memory(gene.reads, G.data))
+        self.assertTrue(numpy.shares_memory(gene.position, G.position))
+        self.assertFalse("k" in gene.__dict__)
+        i = G.orf2index["Rv0244c"]
+        self.assertEqual(gene.n, G.site_end[i] - G.site_start[i])
+        self.assertEqual(gene.k, numpy.sum(numpy.sum(gene.reads, 0) > 0))
+        self.assertEqual(gene.r, max(tnseq_tools.runs(gene.tosses)))
+
+    def test_genes_snapshot(self):
+        temp_dir = tempfile.mkdtemp()
+        try:
+            path = os.path.join(temp_dir, "test.genes")
+            G = tnseq_tools.Genes(all_data_list[:2], small_annotation, norm="TTR")
+            G.save(path)
+            self.assertTrue(tnseq_tools.is_genes_snapshot(path))
+            self.assertFalse(tnseq_tools.is_genes_snapshot(small_annotation))
+            H = tnseq_tools.Genes.load(path)
+            self.assertTrue(isinstance(H.data, numpy.memmap))
+            self.assertEqual([g.orf for g in H], [g.orf for g in G])
+            self.assertEqual([g.k for g in H], [g.k for g in G])
+            self.assertTrue(numpy.array_equal(H["Rv0244c"].reads, G["Rv0244c"].reads))
+            # Trimming different from the snapshot's is recomputed on its data
+            H = tnseq_tools.Genes([path], small_annotation, nterm=10, cterm=10)
+            F = tnseq_tools.Genes([], small_annotation, data=G.data.copy(), position=G.position, nterm=10, cterm=10)
+            self.assertEqual([(g.k, g.n) for g in H], [(g.k, g.n) for g in F])
+        finally:
+            shutil.rmtree(temp_dir)
+
     def test_file_types(self):
         types = tnseq_tools.get_file_types(all_data_list)
         types = set(types)
@@ -76,6 +426,27 @@ class TestTnSeqTools(TransitTestCase):
         norm_data,factors = norm_tools.normalize_data(data, "TTR")
         self.assertFalse((factors == numpy.ones(N)).all())
 
+    def test_normalization_factor_cache(self):
+        data,position = tnseq_tools.get_data(all_data_list[:2])
+        norm_data,factors = norm_tools.normalize_data(data, "nzmean")
+        with mock.patch.object(norm_tools.NZMeanNorm, "normalize") as normalize:
+            cached_data,cached_factors = norm_tools.normalize_data(data, "nzmean")
+            self.assertFalse(normalize.called)
+        self.assertTrue(numpy.array_equal(cached_factors, factors))
+        self.assertTrue(numpy.array_equal(cached_data, norm_data))
+        # Different data (or method) gets its own factors
+        self.assertNotEqual(norm_tools.get_factors_key(data, "nzmean"), norm_tools.get_factors_key(data[::-1], "nzmean"))
+        self.assertNotEqual(norm_tools.get_factors_key(data, "nzmean"), norm_tools.get_factors_key(data, "TTR"))
+
+        temp_dir = tempfile.mkdtemp()
+        try:
+            norm_tools.set_cached_factors("test_key", factors, cache_dir=temp_dir)
+            del norm_tools._factor_cache["test_key"]
+            self.assertTrue(numpy.array_equal(norm_tools.get_cached_factors("test_key", cache_dir=temp_dir), factors))
+            self.assertEqual(norm_tools.get_cached_factors("missing_key", cache_dir=temp_dir), None)
+        finally:
+            shutil.rmtree(temp_dir)
+
 #
 
     def test_cleanargs_negative_arguments(self):